@@ -0,0 +1,21 @@
+from fasthtml.common import *
+from urllib.parse import urlencode
+
+def LoadMoreRow(after_id, search=""):
+    """
+    Placeholder row at the end of a page of records.
+
+    When it scrolls into view, HTMX fetches the next page (users with an
+    id above `after_id`) and replaces this row with it.
+
+    Args:
+        after_id: The id of the last user on the current page
+        search: The active name search, if any
+    """
+    query = urlencode({"after": after_id, "q": search})
+    return Tr(
+        Td("Loading more...", colspan="3", cls="px-4 py-2 text-center text-gray-500 italic"),
+        hx_get=f"/records/page?{query}",
+        hx_trigger="revealed",
+        hx_swap="outerHTML"
+    )
@@ -0,0 +1,32 @@
+from fasthtml.common import *
+
+def UploadStatus(upload, count):
+    """
+    The #status fragment while (and after) a CSV upload is imported.
+
+    While the import runs it polls /upload/{id} every second and is
+    replaced by the fresh progress.
+
+    Args:
+        upload: Dictionary with 'id', 'processed', 'skipped', 'done' and 'error'
+        count: The number of entries in the DB right now
+    """
+    if upload["error"]:
+        return Div(
+            f"Upload failed after {upload['processed']} rows: {upload['error']}. "
+            f"Currently DB contains {count} entries",
+            id="status"
+        )
+    if upload["done"]:
+        return Div(
+            f"Imported {upload['processed']} entries ({upload['skipped']} rows skipped). "
+            f"Currently DB contains {count} entries",
+            id="status"
+        )
+    return Div(
+        f"Importing... {upload['processed']} entries so far. Currently DB contains {count} entries",
+        id="status",
+        hx_get=f"/upload/{upload['id']}",
+        hx_trigger="every 1s",
+        hx_swap="outerHTML"
+    )
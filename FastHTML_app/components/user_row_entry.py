@@ -1,12 +1,12 @@
 from fasthtml.common import *
 
-def UserRowEntry(user, index):
+def UserRowEntry(user):
     """
     Component for rendering a single user row with delete functionality.
     
     Args:
-        user: Dictionary with 'first' and 'last' keys
-        index: The index of the user in the database
+        user: Dictionary with 'id', 'first' and 'last' keys
+              (the id is stable, so rows stay valid after other deletes)
     """
     return Tr(
         Td(user["first"], cls="px-4 py-2 border-b"),
@@ -14,12 +14,12 @@ def UserRowEntry(user, index):
         Td(
             Button(
                 "X",
-                hx_delete=f"/delete/{index}",
+                hx_delete=f"/delete/{user['id']}",
                 hx_target="closest tr",
                 hx_swap="outerHTML swap:0.5s",
                 cls="text-red-600 hover:text-red-800 font-bold px-2"
             ),
             cls="px-4 py-2 border-b text-center"
         ),
-        id=f"user-row-{index}"
+        id=f"user-row-{user['id']}"
     )
\ No newline at end of file
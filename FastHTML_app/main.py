@@ -1,8 +1,15 @@
+import tempfile
+import threading
+
 from fasthtml.common import *
 from components.user_row_entry import UserRowEntry
+from components.load_more_row import LoadMoreRow
+from components.upload_status import UploadStatus
+from store import PAGE_SIZE, UserStore
+from upload import import_csv
 
-# In-memory "database"
-db = []
+# SQLite-backed store (persists across restarts, shared by workers)
+db = UserStore()
 
 app, rt = fast_app(
     hdrs=(
@@ -17,7 +24,7 @@ app, rt = fast_app(
 # ---------- First Page ----------
 @rt("/")
 def get():
-    count = len(db)
+    count = db.count()
     return Div(
         Div(   # Card container
             Titled(
@@ -50,6 +57,19 @@ def get():
                     hx_swap="outerHTML",
                     hx_on__after_request="this.reset()"   # ✅ clears form after request
                 ),
+                Form(
+                    Label("Or upload a CSV of names (first,last)", _for="file", cls="block mb-1 font-medium"),
+                    Input(type="file", name="file", id="file", accept=".csv,text/csv"),
+                    Button(
+                        "Upload >",
+                        type="submit"
+                    ),
+                    hx_post="/upload",
+                    hx_encoding="multipart/form-data",
+                    hx_target="#status",
+                    hx_swap="outerHTML",
+                    hx_on__after_request="this.reset()"
+                ),
                 Hr(cls="my-4"),
                 Div(
                     H3("Activity & Status", cls="text-lg font-semibold mb-2"),
@@ -72,25 +92,72 @@ def get():
 @rt("/add")
 def post(first_name: str, last_name: str):
     if first_name and last_name:
-        db.append({"first": first_name, "last": last_name})
+        db.add(first_name, last_name)
     return Div(
-        f"Currently DB contains {len(db)} entries",
+        f"Currently DB contains {db.count()} entries",
         id="status"
     )
 
 
+# ---------- Bulk CSV Upload ----------
+@rt("/upload")
+async def post(file: UploadFile):
+    # Spool the upload to disk, then import it in the background so the
+    # request returns at once; #status polls for progress
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
+        while chunk := await file.read(1024 * 1024):
+            tmp.write(chunk)
+    upload_id = db.start_upload()
+    threading.Thread(target=import_csv, args=(db, tmp.name, upload_id), daemon=True).start()
+    return UploadStatus(db.upload(upload_id), db.count())
+
+
+@rt("/upload/{upload_id}")
+def get(upload_id: int):
+    upload = db.upload(upload_id)
+    if upload is None:
+        return Div(f"Currently DB contains {db.count()} entries", id="status")
+    return UploadStatus(upload, db.count())
+
+
 # ---------- Delete User ----------
-@rt("/delete/{index}")
-def delete(index: int):
-    if 0 <= index < len(db):
-        db.pop(index)
+@rt("/delete/{user_id}")
+def delete(user_id: int):
+    db.delete(user_id)
     # Return empty string to remove the row from the DOM
     return ""
 
 
 # ---------- Second Page ----------
+def record_rows(after_id=0, q=""):
+    """One page of rows, plus a row that lazy-loads the next page"""
+    users = db.page(after_id, q.strip())
+    rows = [UserRowEntry(user) for user in users]
+    if len(users) == PAGE_SIZE:
+        rows.append(LoadMoreRow(users[-1]["id"], q))
+    return rows
+
+
+@rt("/records/page")
+def get(after: int = 0, q: str = ""):
+    rows = record_rows(after, q)
+    if not rows and not after:
+        return Tr(Td("No matching records.", colspan="3", cls="px-4 py-2 text-center text-gray-500 italic"))
+    return tuple(rows)
+
+
 @rt("/records")
 def get():
+    rows = record_rows()
+    search = Input(
+        type="search",
+        name="q",
+        placeholder="Search first or last name...",
+        hx_get="/records/page",
+        hx_trigger="input changed delay:300ms, search",
+        hx_target="#records-body",
+        hx_swap="innerHTML"
+    )
     table = Table(
         Thead(
             Tr(
@@ -100,14 +167,16 @@ def get():
             )
         ),
         Tbody(
-            *[UserRowEntry(user, idx) for idx, user in enumerate(db)]
+            *rows,
+            id="records-body"
         )
     )
     return Div(
         Div(
             Titled(
                 "User Records",
-                table if db else P("No records found. Add some users first!", cls="text-gray-500 italic"),
+                search,
+                table if rows else P("No records found. Add some users first!", cls="text-gray-500 italic"),
                 A(
                     "< Back to Input", 
                     href="/"
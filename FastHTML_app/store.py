@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+
+# SQLite file shared by every worker (WAL lets readers run next to a writer)
+DB_PATH = os.getenv("USERS_DB", "data/users.db")
+# Rows per page on /records
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id    INTEGER PRIMARY KEY,
+    first TEXT NOT NULL COLLATE NOCASE,
+    last  TEXT NOT NULL COLLATE NOCASE
+);
+-- Row count kept up to date by triggers, so count() reads one row
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) SELECT 'users', count(*) FROM users;
+CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'users';
+END;
+-- Name search is a case-insensitive prefix match, answered from these indexes
+CREATE INDEX IF NOT EXISTS users_first ON users (first);
+CREATE INDEX IF NOT EXISTS users_last ON users (last);
+-- Progress of CSV uploads, readable from any worker
+CREATE TABLE IF NOT EXISTS uploads (
+    id        INTEGER PRIMARY KEY,
+    processed INTEGER NOT NULL DEFAULT 0,
+    skipped   INTEGER NOT NULL DEFAULT 0,
+    done      INTEGER NOT NULL DEFAULT 0,
+    error     TEXT
+);
+"""
+
+
+class UserStore:
+    """
+    Users in SQLite, keyed by a stable id.
+
+    Inserts and deletes by id are single index operations, and count()
+    reads the trigger-maintained counter instead of scanning the table.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread (sync routes run in a thread pool)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, first, last):
+        """Insert a user and return its id"""
+        with self._conn() as conn:
+            return conn.execute("INSERT INTO users (first, last) VALUES (?, ?)", (first, last)).lastrowid
+
+    def add_many(self, rows):
+        """Insert (first, last) pairs in one transaction; returns how many"""
+        with self._conn() as conn:
+            return conn.executemany("INSERT INTO users (first, last) VALUES (?, ?)", rows).rowcount
+
+    def delete(self, user_id):
+        """Delete a user by id; False if there was none"""
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount > 0
+
+    def count(self):
+        return self._conn().execute("SELECT value FROM counters WHERE name = 'users'").fetchone()[0]
+
+    def all(self):
+        """Every user as {'id', 'first', 'last'}, oldest first"""
+        return [dict(row) for row in self._conn().execute("SELECT id, first, last FROM users ORDER BY id")]
+
+    def page(self, after_id=0, search=None, limit=PAGE_SIZE):
+        """
+        Up to `limit` users with an id above `after_id`, oldest first.
+
+        Keyset pagination: without `search`, every page is a range scan on
+        the id, however deep. `search` matches the start of the first or last
+        name (any case); each name is searched on its own index and keeps at
+        most `limit` ids before the two are merged, so the merge and the final
+        sort stay page-sized. A name's index is ordered by name, not id, so
+        each of those searches still reads that name's matches above `after_id`.
+        """
+        if not search:
+            sql = "SELECT id, first, last FROM users WHERE id > ? ORDER BY id LIMIT ?"
+            return [dict(row) for row in self._conn().execute(sql, (after_id, limit))]
+        prefix = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        # A branch per name (an OR would make SQLite walk the id order
+        # instead); UNION drops users matching on both names
+        branch = "SELECT id FROM (SELECT id FROM users WHERE {} LIKE ? ESCAPE '\\' AND id > ? ORDER BY id LIMIT ?)"
+        sql = (f"SELECT id, first, last FROM users WHERE id IN ({branch.format('first')}"
+               f" UNION {branch.format('last')}) ORDER BY id LIMIT ?")
+        params = (prefix, after_id, limit, prefix, after_id, limit, limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    # ---------- CSV uploads ----------
+
+    def start_upload(self):
+        with self._conn() as conn:
+            return conn.execute("INSERT INTO uploads DEFAULT VALUES").lastrowid
+
+    def update_upload(self, upload_id, processed, skipped, done=False, error=None):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE uploads SET processed = ?, skipped = ?, done = ?, error = ? WHERE id = ?",
+                (processed, skipped, int(done), error, upload_id)
+            )
+
+    def upload(self, upload_id):
+        row = self._conn().execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        return dict(row) if row else None
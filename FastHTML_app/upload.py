@@ -0,0 +1,40 @@
+import csv
+import os
+
+# Rows inserted per transaction while importing a CSV
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "1000"))
+
+HEADER_NAMES = {"first", "first_name", "first name", "firstname"}
+
+
+def import_csv(store, path, upload_id, batch_size=UPLOAD_BATCH_SIZE):
+    """
+    Stream a CSV of first,last names into the store, one batch per transaction.
+
+    A header row is skipped, as are rows without both names. Progress is
+    written to the uploads table after every batch; the file is removed
+    when done.
+    """
+    processed = skipped = 0
+    batch = []
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for i, row in enumerate(csv.reader(f)):
+                cells = [c.strip() for c in row]
+                if i == 0 and cells and cells[0].lower() in HEADER_NAMES:
+                    continue
+                if len(cells) < 2 or not cells[0] or not cells[1]:
+                    skipped += 1
+                    continue
+                batch.append((cells[0], cells[1]))
+                if len(batch) >= batch_size:
+                    processed += store.add_many(batch)
+                    batch = []
+                    store.update_upload(upload_id, processed, skipped)
+        if batch:
+            processed += store.add_many(batch)
+        store.update_upload(upload_id, processed, skipped, done=True)
+    except Exception as e:
+        store.update_upload(upload_id, processed, skipped, done=True, error=str(e))
+    finally:
+        os.remove(path)
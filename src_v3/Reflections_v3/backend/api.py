@@ -1,48 +1,133 @@
 """
 REST API for Reflection Management
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import asyncio
+import hashlib
+import itertools
+import orjson
 import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
-from urllib.parse import quote_plus
 
 # Import all models, including the new User model
-from .models import Base, Topic, Reflection, User
+from .models import Base, Topic, Reflection, User, IdempotencyKey, ensure_partitions, reflection_topics, topic_link
 from .classifier import classify_reflection_topics
+from .prompt_budget import fit_to_budget
+from . import cache, events
+# Engines and sessions for DATABASE_URL (PostgreSQL or tuned SQLite)
+from .settings import REPLICA_URLS, ReadOnlySessionLocal, SessionLocal, engine
+from .queries import (
+    FIELD_PRESETS,
+    FULL_FIELDS,
+    REFLECTION_FIELDS,
+    SUMMARY_FIELDS,
+    select_reflections,
+    select_topics,
+    select_users
+)
+from .topics import upsert_topics, insert_ignore
+from .dedup import DUPLICATE_MODE, find_near_duplicates, record_signatures, signature
+from .events import reflection_event
+from .group_commit import GROUP_COMMIT, GroupCommitter
+from .similarity import build_index_in_background, get_index, reflection_document, save_index, vectorize
+from .export import EXPORT_MEDIA_TYPES, SERIALIZERS, iter_chunks, parquet_available
+from .ingest import (
+    BULK_BATCH_SIZE,
+    ResultSpool,
+    insert_reflection_batch,
+    iter_lines,
+    parse_rows,
+    validate_row
+)
 
 # ============================================================================
-# Load Environment Variables
+# Optional Read Replicas
 # ============================================================================
-load_dotenv()
-
-USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
-if not USER or not PASSWORD or not HOST or not PORT or not DBNAME:
-    print("❌ ERROR: one or more DB variables are not in .env file")
-    exit(1)
-# if password contain special character
-encoded_password = quote_plus(PASSWORD)
-# Construct the SQLAlchemy connection string
-DATABASE_URL = f"postgresql+psycopg2://{USER}:{encoded_password}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-
-# If using Transaction Pooler or Session Pooler, we want to ensure we disable SQLAlchemy client side pooling -
-# https://docs.sqlalchemy.org/en/20/core/pooling.html#switching-pool-implementations
-engine = create_engine(DATABASE_URL, poolclass=NullPool)
-SessionLocal = sessionmaker(bind=engine)
+replica_engines = [create_engine(url, poolclass=NullPool) for url in REPLICA_URLS]
+_replica_sessions = itertools.cycle([sessionmaker(bind=e) for e in replica_engines])
+
+# After a write the browser gets this cookie for a few seconds, so the
+# redirect that follows reads its own write from the primary.
+READ_PRIMARY_COOKIE = "read_primary"
+READ_PRIMARY_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+_pin_primary = ContextVar("pin_primary", default=False)
+
+def ReadSessionLocal():
+    """Session for read-only work: the next replica, or the primary if none
+    are configured or the current request is pinned to the primary"""
+    if not replica_engines or _pin_primary.get():
+        return ReadOnlySessionLocal()
+    return next(_replica_sessions)()
+
+@contextmanager
+def use_primary():
+    """Route every read inside this block to the primary"""
+    token = _pin_primary.set(True)
+    try:
+        yield
+    finally:
+        _pin_primary.reset(token)
+
+# How long an Idempotency-Key (or form token) protects against a repeat
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# How long a form token stays reserved while its reflection is classified;
+# a repeat submission waits this long for the first one to finish
+IDEMPOTENCY_PENDING_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "60"))
+
+# Cross-worker cache invalidation rides on the same database
+cache.configure(engine)
 
 # ============================================================================
 # FastAPI App
 # ============================================================================
-app = FastAPI(title="Reflection API")
+async def start_worker():
+    """Per-worker background work: cache listener, similarity index build
+
+    Async so startup hooks run it on the event loop's thread, where signal
+    handlers can be installed.
+    """
+    events.close_on_signal()
+    cache.start_listener()
+    start_index_build()
+
+def stop_worker():
+    events.broker.close()
+    cache.stop_listener()
+    save_index()
+
+# Only used when api.py runs on its own; when mounted under the frontend,
+# frontend/ui.py runs start_worker/stop_worker instead.
+@asynccontextmanager
+async def lifespan(app):
+    await start_worker()
+    try:
+        yield
+    finally:
+        stop_worker()
+
+# Responses are encoded with orjson instead of jsonable_encoder + json
+app = FastAPI(title="Reflection API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+@app.middleware("http")
+async def pin_reads_after_write(request, call_next):
+    """Read-your-writes: requests carrying the pin cookie read from the primary"""
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        with use_primary():
+            return await call_next(request)
+    return await call_next(request)
 
 # ============================================================================
 # Pydantic Models
@@ -84,88 +169,324 @@ class UserOutput(BaseModel):
     firstname: str | None
     email: str
 
+# ============================================================================
+# Response models for read endpoints
+# ============================================================================
+# Read endpoints declare these for the docs but return rows built by
+# backend/queries.py directly as ORJSONResponse, so FastAPI skips
+# validating and re-encoding data that came straight from our database.
+class ReflectionOutput(BaseModel):
+    id: int
+    title: str | None = None
+    text: str | None = None
+    excerpt: str | None = None
+    word_count: int | None = None
+    timestamp: datetime | None = None
+    user_id: int | None = None
+    topics: List[str] | None = None
+
+class RelatedReflectionOutput(BaseModel):
+    id: int
+    title: str
+    timestamp: datetime
+    user_id: int
+    score: float
+
+def json_rows(rows):
+    """Trusted rows (dicts or SQLAlchemy Rows) straight to an orjson response"""
+    return ORJSONResponse([r if isinstance(r, dict) else r._asdict() for r in rows])
+
 # ============================================================================
 # Database Helper Functions without API Endpoints and async for frontend use 
 # ============================================================================
 
+# Cache loaders read from the primary: an invalidation must never be
+# refilled with data from a replica that has not caught up yet.
+
+def _load_all_users():
+    db = ReadOnlySessionLocal()
+    try:
+        return select_users(db)
+    finally:
+        db.close()
+
+def _load_topic_names():
+    db = ReadOnlySessionLocal()
+    try:
+        return [t.name for t in db.query(Topic).all()]
+    finally:
+        db.close()
+
 def db_get_all_users():
-    """Get all users - can be called directly from frontend"""
-    db = SessionLocal()
+    """Get all users - can be called directly from frontend
+
+    Rows with .id, .firstname and .email, like UserOutput.
+    """
+    return list(cache.users_cache.get_or_load("all", _load_all_users))
+
+def _load_user(user_id: int):
+    db = ReadOnlySessionLocal()
     try:
-        users = db.query(User).all()
-        return [UserOutput(id=u.id, firstname=u.firstname, email=u.email) for u in users]
+        users = select_users(db, User.id == user_id)
+        return users[0] if users else None
     finally:
         db.close()
 
 def db_get_user(user_id: int):
     """Get a user by ID - can be called directly from frontend"""
-    db = SessionLocal()
+    user = cache.users_cache.get_or_load(("id", user_id), lambda: _load_user(user_id))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def db_get_users(user_ids: List[int]):
+    """Get several users in one IN query - can be called directly from frontend"""
+    db = ReadSessionLocal()
     try:
-        db_user = db.query(User).filter(User.id == user_id).first()
-        if not db_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        return UserOutput(id=db_user.id, firstname=db_user.firstname, email=db_user.email)
+        by_id = {r.id: r for r in select_users(db, User.id.in_(user_ids))}
+        return [by_id[i] for i in dict.fromkeys(user_ids) if i in by_id]
     finally:
         db.close()
 
-def db_get_all_reflections():
-    """Get all reflections - can be called directly from frontend"""
-    db = SessionLocal()
+MAX_IDS_PER_REQUEST = int(os.getenv("MAX_IDS_PER_REQUEST", "500"))
+
+def parse_fields(fields: str | None, default: List[str]) -> List[str]:
+    """'title,topics' -> ['id', 'title', 'topics'] (id is always included)"""
+    if not fields:
+        return default
+    if fields in FIELD_PRESETS:
+        return FIELD_PRESETS[fields]
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in REFLECTION_FIELDS and n != "topics"]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [n for n in names if n != "id"]
+
+def parse_ids(ids: str) -> List[int]:
+    """'1,2,3' -> [1, 2, 3]"""
     try:
-        reflections = db.query(Reflection).all()
-        return [
-            {
-                "id": r.id,
-                "title": r.title,
-                "text": r.text,
-                "timestamp": r.timestamp,
-                "user_id": r.user_id,
-                "topics": [t.name for t in r.topic_list]
-            }
-            for r in reflections
-        ]
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if len(parsed) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS_PER_REQUEST} ids per request")
+    return parsed
+
+def db_get_all_reflections(fields: List[str] = SUMMARY_FIELDS,
+                           since: datetime | None = None, until: datetime | None = None):
+    """Get all reflections - can be called directly from frontend
+
+    By default only the summary fields are read (no full text). since
+    (inclusive) / until (exclusive) limit the time range, which on a
+    partitioned table only reads the months in range.
+    """
+    criteria = []
+    if since is not None:
+        criteria.append(Reflection.timestamp >= since)
+    if until is not None:
+        criteria.append(Reflection.timestamp < until)
+    db = ReadSessionLocal()
+    try:
+        return select_reflections(db, fields, *criteria)
     finally:
         db.close()
 
-def db_get_reflection(reflection_id: int):
+def db_get_reflections(reflection_ids: List[int], fields: List[str] = FULL_FIELDS):
+    """Get several reflections in one IN query, in the order asked for"""
+    db = ReadSessionLocal()
+    try:
+        by_id = {r["id"]: r for r in select_reflections(db, fields, Reflection.id.in_(reflection_ids))}
+        return [by_id[i] for i in dict.fromkeys(reflection_ids) if i in by_id]
+    finally:
+        db.close()
+
+def db_get_reflection(reflection_id: int, fields: List[str] = FULL_FIELDS):
     """Get a single reflection - can be called directly from frontend"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
-        db_reflection = db.query(Reflection).filter(Reflection.id == reflection_id).first()
-        
-        if not db_reflection:
+        reflections = select_reflections(db, fields, Reflection.id == reflection_id)
+        if not reflections:
             raise HTTPException(status_code=404, detail="Reflection not found")
-            
-        return {
-            "id": db_reflection.id,
-            "title": db_reflection.title,
-            "text": db_reflection.text,
-            "timestamp": db_reflection.timestamp,
-            "user_id": db_reflection.user_id,
-            "topics": [t.name for t in db_reflection.topic_list]
-        }
+        return reflections[0]
     finally:
         db.close()
 
+def db_find_duplicate(user_id: int, text: str):
+    """The user's recent reflection this text nearly duplicates, or None
+
+    Raises 409 when DUPLICATE_MODE is "reject", so the caller can stop
+    before paying for classification.
+    """
+    if DUPLICATE_MODE == "off":
+        return None
+    sig = signature(text)
+    if sig is None:
+        return None
+    db = ReadOnlySessionLocal()
+    try:
+        duplicate = find_near_duplicates(db, [(user_id, sig)])[0]
+    finally:
+        db.close()
+    if duplicate is None:
+        return None
+    if DUPLICATE_MODE == "reject":
+        raise HTTPException(status_code=409, detail=f"Near-duplicate of reflection {duplicate[0]}")
+    return db_get_reflection(duplicate[0], ["id", "topics"])
+
+def start_index_build():
+    """Build this worker's similarity index off the request path (at startup)"""
+    # The primary: reflections created just before startup must be included
+    build_index_in_background(ReadOnlySessionLocal)
+
+def db_get_related_reflections(reflection_id: int, k: int = 5):
+    """The k most similar reflections (local similarity index), most similar first"""
+    index = get_index()
+    # Catch up with reflections created elsewhere (primary: they may be brand new)
+    db = ReadOnlySessionLocal()
+    try:
+        index.sync(db)
+        vector = index.vector_for(reflection_id)
+        if vector is None:
+            row = db.execute(
+                select(Reflection.title, Reflection.text).where(Reflection.id == reflection_id)
+            ).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Reflection not found")
+            vector = vectorize(reflection_document(row.title, row.text))
+    finally:
+        db.close()
+
+    matches = index.search(vector, k, exclude=[reflection_id])
+    scores = dict(matches)
+    related = db_get_reflections([rid for rid, _ in matches], ["id", "title", "timestamp", "user_id"])
+    return [{**r, "score": round(scores[r["id"]], 4)} for r in related]
+
 async def db_classify_reflection(reflection: ClassifyReflectionInput):
     """Classify a reflection - can be called directly from frontend"""
-    db = SessionLocal()
-    try:
-        all_topics = db.query(Topic).all()
-        existing_topic_names = [t.name for t in all_topics]
-        
+    existing_topic_names = cache.topics_cache.get_or_load("names", _load_topic_names)
+
+    # Same reflection against the same topic list -> same answer, skip the LLM call
+    key = (reflection.title, reflection.text, tuple(existing_topic_names))
+    topics = cache.classifier_cache.get(key)
+    if topics is None:
+        # Long entries are cut down to CLASSIFIER_TOKEN_BUDGET tokens before the LLM call
         topics = await classify_reflection_topics(
             reflection.title,
-            reflection.text,
+            fit_to_budget(reflection.text),
             existing_topic_names
         )
-        
-        return ClassifyReflectionOutput(topics=topics)
+        cache.classifier_cache.set(key, topics)
+
+    return ClassifyReflectionOutput(topics=list(topics))
+
+def request_fingerprint(*parts) -> str:
+    """Hash of what a request asks for, stored with its idempotency key"""
+    return hashlib.sha256(orjson.dumps(parts)).hexdigest()
+
+def db_get_idempotent_result(user_id: int, idempotency_key: str | None, request_hash: str):
+    """Return the reflection_id this user already created with this key (if not expired)
+
+    Raises 422 when the key was used for a different request.
+    """
+    if not idempotency_key:
+        return None
+    # Always the primary: the point is to see our own earlier write
+    db = SessionLocal()
+    try:
+        row = db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == idempotency_key,
+            IdempotencyKey.expires_at > datetime.now()
+        ).first()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    if row.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if row.reflection_id is None:
+        return None  # still being processed
+    return CreateReflectionOutput(reflection_id=row.reflection_id)
+
+async def db_reserve_idempotency_key(user_id: int, idempotency_key: str, request_hash: str):
+    """Claim a key before slow work (classification) - can be called directly from frontend
+
+    Returns None once this call holds the key (pending: no reflection_id
+    yet), or the original result if the key was already used. While another
+    request holds it, waits for that request to finish.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_PENDING_SECONDS
+    while True:
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            # A holder that died leaves an expired reservation behind
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == idempotency_key,
+                IdempotencyKey.expires_at <= now
+            ).delete(synchronize_session=False)
+            db.add(IdempotencyKey(
+                user_id=user_id,
+                key=idempotency_key,
+                request_hash=request_hash,
+                reflection_id=None,
+                created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_PENDING_SECONDS)
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+        finally:
+            db.close()
+
+        existing = db_get_idempotent_result(user_id, idempotency_key, request_hash)
+        if existing:
+            return existing
+        if time.monotonic() > deadline:
+            raise HTTPException(status_code=409, detail="This submission is still being processed")
+        await asyncio.sleep(0.25)
+
+def db_release_idempotency_key(user_id: int, idempotency_key: str):
+    """Drop a pending reservation (the create failed), so the form can be submitted again"""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == idempotency_key,
+            IdempotencyKey.reflection_id.is_(None)
+        ).delete(synchronize_session=False)
+        db.commit()
     finally:
         db.close()
 
-async def db_create_reflection(reflection: CreateReflectionInput):
-    """Create a reflection - can be called directly from frontend"""
+async def db_create_reflection(reflection: CreateReflectionInput, idempotency_key: str | None = None,
+                               request_hash: str | None = None):
+    """Create a reflection - can be called directly from frontend
+
+    With an idempotency key, repeating the call returns the original
+    reflection_id instead of inserting a duplicate. request_hash
+    fingerprints the request (default: the whole reflection); a reused key
+    with a different fingerprint is refused with 422.
+    """
+    if idempotency_key and request_hash is None:
+        request_hash = request_fingerprint(reflection.model_dump(mode="json"))
+    existing = db_get_idempotent_result(reflection.user_id, idempotency_key, request_hash)
+    if existing:
+        return existing
+    if group_committer is not None:
+        # Written together with other concurrent creates (see backend/group_commit.py)
+        reflection_id = await group_committer.submit(reflection, idempotency_key, request_hash)
+        return CreateReflectionOutput(reflection_id=reflection_id)
+    return _create_reflection(reflection, idempotency_key, request_hash)
+
+def _create_reflection(reflection: CreateReflectionInput, idempotency_key: str | None = None,
+                       request_hash: str | None = None):
+    """Create one reflection in its own transaction"""
+    ensure_partitions(engine, [reflection.timestamp])
+
     db = SessionLocal()
     try:
         # Check if user exists first
@@ -173,6 +494,15 @@ async def db_create_reflection(reflection: CreateReflectionInput):
         if not user:
             raise HTTPException(status_code=404, detail=f"User with id {reflection.user_id} not found")
 
+        # Near-duplicate of one of this user's recent reflections?
+        sig = duplicate = None
+        if DUPLICATE_MODE != "off":
+            sig = signature(reflection.text)
+        if sig is not None:
+            duplicate = find_near_duplicates(db, [(reflection.user_id, sig)])[0]
+            if duplicate and DUPLICATE_MODE == "reject":
+                raise HTTPException(status_code=409, detail=f"Near-duplicate of reflection {duplicate[0]}")
+
         # Create the reflection
         db_reflection = Reflection(
             title=reflection.title,
@@ -184,22 +514,123 @@ async def db_create_reflection(reflection: CreateReflectionInput):
         # Add the reflection to the session FIRST
         db.add(db_reflection)
         
-        # Then add topics
-        for topic_name in reflection.topics:
-            topic = db.query(Topic).filter(Topic.name == topic_name).first()
-            if not topic:
-                topic = Topic(name=topic_name)
-                db.add(topic)
-                db.flush()  # Flush to ensure topic gets an ID
-            db_reflection.topic_list.append(topic)
+        # Then add topics (canonicalized, missing ones created in one statement)
+        topic_ids = upsert_topics(db, reflection.topics)
+        if topic_ids:
+            db_reflection.topic_list = db.query(Topic).filter(Topic.id.in_(set(topic_ids.values()))).all()
+        elif duplicate:
+            # A flagged duplicate without topics gets the original's
+            db_reflection.topic_list = list(db.get(Reflection, duplicate[0]).topic_list)
+
+        if sig is not None:
+            db.flush()  # Flush to get the reflection ID
+            record_signatures(db, [{
+                "reflection_id": db_reflection.id,
+                "user_id": reflection.user_id,
+                "signature": sig,
+                "duplicate_of": duplicate[0] if duplicate else None
+            }])
+
+        if idempotency_key:
+            now = datetime.now()
+            # Expired keys (including an old use of this one) are dropped here;
+            # the expires_at index keeps this cheap
+            db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+            # So is this key's pending reservation (see db_reserve_idempotency_key)
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.user_id == reflection.user_id,
+                IdempotencyKey.key == idempotency_key,
+                IdempotencyKey.reflection_id.is_(None)
+            ).delete(synchronize_session=False)
+            db.flush()  # Flush to get the reflection ID
+            db.add(IdempotencyKey(
+                user_id=reflection.user_id,
+                key=idempotency_key,
+                request_hash=request_hash,
+                reflection_id=db_reflection.id,
+                created_at=now,
+                expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+            ))
         
-        db.commit()
+        try:
+            # This flush also writes the idempotency key: losing a race on
+            # it has to end up in the handler below
+            db.flush()  # The live event needs the reflection ID
+            events.publish(reflection_event(
+                "created", db_reflection.id, reflection.title, reflection.timestamp,
+                reflection.user_id, [t.name for t in db_reflection.topic_list]
+            ), session=db)
+            cache.invalidate("fragments", "reflections", session=db)
+            db.commit()
+        except IntegrityError:
+            # A concurrent request with the same key won the race
+            db.rollback()
+            existing = db_get_idempotent_result(reflection.user_id, idempotency_key, request_hash)
+            if existing:
+                return existing
+            raise
         db.refresh(db_reflection)
+
+        # Make it findable as a related reflection right away in this worker
+        # (the reflection is committed: an index problem must not fail the create)
+        try:
+            get_index().add(db_reflection.id, reflection_document(reflection.title, reflection.text))
+        except Exception as e:
+            print(f"⚠️ similarity index update failed for reflection {db_reflection.id}: {e}")
         
         return CreateReflectionOutput(reflection_id=db_reflection.id)
     finally:
         db.close()
 
+group_committer = GroupCommitter(
+    fallback=lambda reflection, key, request_hash: _create_reflection(reflection, key, request_hash).reflection_id,
+    idempotency_ttl=timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+) if GROUP_COMMIT else None
+
+def db_attach_topics(reflection_id: int, topic_names: List[str], timestamp: datetime):
+    """Link topics (creating missing ones) to an existing reflection (created at timestamp)"""
+    db = SessionLocal()
+    try:
+        topic_ids = upsert_topics(db, topic_names)
+        if topic_ids:
+            db.execute(
+                insert_ignore(db, reflection_topics),
+                [topic_link(reflection_id, topic_id, timestamp) for topic_id in set(topic_ids.values())]
+            )
+            # Open list pages patch this reflection's card
+            r = select_reflections(db, ["id", "title", "timestamp", "user_id", "topics"], Reflection.id == reflection_id)[0]
+            events.publish(reflection_event(
+                "updated", r["id"], r["title"], r["timestamp"], r["user_id"], r["topics"]
+            ), session=db)
+        cache.invalidate("fragments", session=db)
+        db.commit()
+    finally:
+        db.close()
+
+async def db_classify_unlabeled(reflection_ids: List[int], page_size: int = 100):
+    """Classify the given reflections that have no topics yet
+
+    Used after a bulk import, with the ids it created; reads a page at a time.
+    """
+    for start in range(0, len(reflection_ids), page_size):
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Reflection.id, Reflection.title, Reflection.text, Reflection.timestamp)
+                .where(Reflection.id.in_(reflection_ids[start:start + page_size]), ~Reflection.topic_list.any())
+                .order_by(Reflection.id)
+            ).all()
+        finally:
+            db.close()
+        for row in rows:
+            try:
+                classified = await db_classify_reflection(
+                    ClassifyReflectionInput(title=row.title, text=row.text, timestamp=row.timestamp)
+                )
+                db_attach_topics(row.id, classified.topics, row.timestamp)
+            except Exception as e:
+                print(f"⚠️ classification failed for reflection {row.id}: {e}")
+
 # ============================================================================
 # API Endpoints for run api server - modified create_reflection
 # ============================================================================
@@ -215,126 +646,188 @@ async def create_topics(topics: TopicsInput):
     """Add new topics to the database"""
     db = SessionLocal()
     try:
-        created_topics = []
-        for name in topics.names:
-            existing = db.query(Topic).filter(Topic.name == name).first()
-            if not existing:
-                db_topic = Topic(name=name)
-                db.add(db_topic)
-                # Flush to get ID before commit
-                db.flush()
-                created_topics.append(db_topic)
-            else:
-                created_topics.append(existing)
+        # Names are canonicalized: near duplicates return the existing topic
+        topic_ids = upsert_topics(db, topics.names)
+        names = {topic_id: name for name, topic_id in db.execute(
+            select(Topic.name, Topic.id).where(Topic.id.in_(set(topic_ids.values())))
+        )}
         db.commit()
-        return [TopicOutput(id=t.id, name=t.name) for t in created_topics]
+        return [
+            TopicOutput(id=topic_ids[name], name=names[topic_ids[name]])
+            for name in dict.fromkeys(topics.names) if name in topic_ids
+        ]
     finally:
         db.close()
 
 @app.get("/api/topics", response_model=List[TopicOutput])
 async def get_topics():
     """Retrieve all topics from the database"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
-        topics = db.query(Topic).all()
-        return [TopicOutput(id=t.id, name=t.name) for t in topics]
+        return json_rows(select_topics(db))
     finally:
         db.close()
 
 # --- Reflection Endpoints (create_reflection is modified) ---
 
 @app.post("/api/reflections", response_model=CreateReflectionOutput)
-async def create_reflection(reflection: CreateReflectionInput):
-    """Store a new reflection in the database"""
-    db = SessionLocal()
-    try:
-        # Check if user exists first (good practice)
-        user = db.query(User).filter(User.id == reflection.user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail=f"User with id {reflection.user_id} not found")
-
-        # Create the reflection with the new user_id field
-        db_reflection = Reflection(
-            title=reflection.title,
-            text=reflection.text,
-            timestamp=reflection.timestamp,
-            user_id=reflection.user_id  # <-- NECESSARY CHANGE
-        )
-        
-        # Topic logic is unchanged
-        for topic_name in reflection.topics:
-            topic = db.query(Topic).filter(Topic.name == topic_name).first()
-            if not topic:
-                topic = Topic(name=topic_name)
-                db.add(topic)
-            db_reflection.topic_list.append(topic)
-        
-        db.add(db_reflection)
-        db.commit()
-        db.refresh(db_reflection)
-        
-        return CreateReflectionOutput(reflection_id=db_reflection.id)
-    finally:
-        db.close()
-
-@app.get("/api/reflections/{reflection_id}")
-async def get_reflection(reflection_id: int):
-    """Retrieve a single reflection by its ID"""
-    db = SessionLocal()
-    try:
-        db_reflection = db.query(Reflection).filter(Reflection.id == reflection_id).first()
-        
-        if not db_reflection:
-            raise HTTPException(status_code=404, detail="Reflection not found")
-            
-        return {
-            "id": db_reflection.id, # Added id
-            "title": db_reflection.title,
-            "text": db_reflection.text,
-            "timestamp": db_reflection.timestamp,
-            "user_id": db_reflection.user_id, # Added user_id
-            "topics": [t.name for t in db_reflection.topic_list]
-        }
-    finally:
-        db.close()
-
-@app.get("/api/reflections")
-async def get_all_reflections():
-    """Retrieve all reflections"""
-    db = SessionLocal()
-    try:
-        reflections = db.query(Reflection).all()
-        return [
-            {
-                "id": r.id,
-                "title": r.title,
-                "text": r.text,
-                "timestamp": r.timestamp,
-                "user_id": r.user_id, # Added user_id
-                "topics": [t.name for t in r.topic_list]
-            }
-            for r in reflections
-        ]
-    finally:
-        db.close()        
+async def create_reflection(
+    reflection: CreateReflectionInput,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
+):
+    """Store a new reflection in the database
+
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    returns the original reflection_id instead of creating a duplicate.
+    Keys are per user; reusing one for a different body returns 422.
+    """
+    return await db_create_reflection(reflection, idempotency_key)
+
+# Registered before /api/reflections/{reflection_id} so "export" is not read as an id
+@app.get("/api/reflections/export")
+def export_reflections(
+    format: str = "ndjson",
+    user_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None
+):
+    """Stream every reflection (with topics) as NDJSON, CSV or Parquet
+
+    Optional filters: user_id, since (inclusive) and until (exclusive).
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be ndjson, csv or parquet")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    chunks = iter_chunks(ReadSessionLocal(), user_id, since, until)
+    return StreamingResponse(
+        SERIALIZERS[format](chunks),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="reflections.{format}"'}
+    )
+
+@app.get("/api/reflections/events")
+async def reflection_events(user_id: int | None = None):
+    """Server-sent events: "created" and "updated" reflections as JSON,
+    optionally only those of one user"""
+    async def stream():
+        async for event in events.broker.stream(user_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {orjson.dumps(event['reflection']).decode()}\n\n"
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/reflections/{reflection_id}/related", response_model=List[RelatedReflectionOutput])
+async def get_related_reflections(reflection_id: int, k: int = 5):
+    """Reflections most similar to this one (computed locally, no network calls)"""
+    return json_rows(await run_in_threadpool(db_get_related_reflections, reflection_id, min(k, 50)))
+
+@app.get("/api/reflections/{reflection_id}", response_model=ReflectionOutput)
+async def get_reflection(reflection_id: int, fields: str | None = None):
+    """Retrieve a single reflection by its ID
+
+    fields=title,topics (or a preset: summary, full) limits what is read and returned.
+    """
+    return ORJSONResponse(db_get_reflection(reflection_id, parse_fields(fields, FULL_FIELDS)))
+
+@app.get("/api/reflections", response_model=List[ReflectionOutput])
+async def get_all_reflections(
+    ids: str | None = None,
+    fields: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None
+):
+    """Retrieve all reflections, or only ids=1,2,3 (one query)
+
+    fields=title,topics (or a preset: summary, full) limits what is read
+    and returned; id is always included. fields=summary returns excerpt
+    and word_count instead of the full text. since (inclusive) and until
+    (exclusive) limit the time range.
+    """
+    if ids is not None:
+        return json_rows(db_get_reflections(parse_ids(ids), parse_fields(fields, FULL_FIELDS)))
+    return json_rows(db_get_all_reflections(parse_fields(fields, FULL_FIELDS), since, until))
+
+def _write_bulk_batch(batch, spool: ResultSpool, classify: bool):
+    """Insert one batch of (row_number, row, validation_error) and record
+    per-row results, in input order
+
+    Returns the ids of inserted reflections queued for classification.
+    """
+    valid = [row for _, row, error in batch if not error]
+    results = []
+    if valid:
+        db = SessionLocal()
+        try:
+            results = insert_reflection_batch(db, valid)
+            cache.invalidate("fragments", "reflections", session=db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            results = [(None, f"batch failed: {e}")] * len(valid)
+        finally:
+            db.close()
+
+    queued = []
+    results = iter(results)
+    for row_number, row, error in batch:
+        reflection_id = None
+        if not error:
+            reflection_id, error = next(results)
+        if error:
+            spool.write({"row": row_number, "status": "error", "error": error})
+            continue
+        result = {"row": row_number, "status": "created", "reflection_id": reflection_id}
+        if classify and not row.topics:
+            result["classification"] = "queued"
+            queued.append(reflection_id)
+        spool.write(result)
+    return queued
+
+@app.post("/api/reflections/bulk")
+async def bulk_import_reflections(request: Request, format: str | None = None, classify: bool = False):
+    """Import many reflections from a streamed NDJSON or CSV body
+
+    Each row: title, text, timestamp, user_id and optional topics
+    (a JSON list, or ';'-separated in CSV). With classify=true, rows
+    without topics are classified in the background after the import.
+    Responds with one NDJSON result line per row, in input order, plus a
+    summary line.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    spool = ResultSpool()
+    batch = []
+    to_classify = []
+
+    async def flush():
+        nonlocal batch
+        to_classify.extend(await run_in_threadpool(_write_bulk_batch, batch, spool, classify))
+        batch = []
+
+    async for row_number, data in parse_rows(iter_lines(request.stream()), fmt):
+        # Invalid rows wait in the batch too, so results keep the input order
+        row, error = validate_row(data)
+        batch.append((row_number, row, error))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    background = None
+    if to_classify:
+        # Only this import's rows: other requests may be writing the same id range
+        background = BackgroundTask(db_classify_unlabeled, to_classify)
+    return StreamingResponse(spool.iter_and_close(), media_type="application/x-ndjson", background=background)
 
 @app.post("/api/reflections/classify", response_model=ClassifyReflectionOutput)
 async def classify_reflection(reflection: ClassifyReflectionInput):
     """Classify topics from a reflection"""
-    db = SessionLocal()
-    try:
-        all_topics = db.query(Topic).all()
-        existing_topic_names = [t.name for t in all_topics]
-        
-        topics = await classify_reflection_topics(
-            reflection.title,
-            reflection.text,
-            existing_topic_names
-        )
-        
-        return ClassifyReflectionOutput(topics=topics)
-    finally:
-        db.close()
+    return await db_classify_reflection(reflection)
 
 # ============================================================================
 # NEW: User Endpoints for curl commands
@@ -355,6 +848,7 @@ async def create_user(user: UserCreateInput):
             email=user.email
         )
         db.add(db_user)
+        cache.invalidate("users", "fragments", session=db)
         db.commit()
         db.refresh(db_user)
         
@@ -365,33 +859,20 @@ async def create_user(user: UserCreateInput):
 @app.get("/api/users/{user_id}", response_model=UserOutput)
 async def get_user(user_id: int):
     """Get a user by their ID"""
-    db = SessionLocal()
-    try:
-        db_user = db.query(User).filter(User.id == user_id).first()
-        if not db_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return UserOutput(id=db_user.id, firstname=db_user.firstname, email=db_user.email)
-    finally:
-        db.close()
+    return ORJSONResponse(db_get_user(user_id)._asdict())
 
 @app.get("/api/users", response_model=List[UserOutput])
-async def get_all_users():
-    """Get all users"""
-    db = SessionLocal()
-    try:
-        users = db.query(User).all()
-        return [
-            UserOutput(id=u.id, firstname=u.firstname, email=u.email)
-            for u in users
-        ]
-    finally:
-        db.close()
+async def get_all_users(ids: str | None = None):
+    """Get all users, or only ids=1,2,3 (one query)"""
+    if ids is not None:
+        return json_rows(db_get_users(parse_ids(ids)))
+    return json_rows(db_get_all_users())
 
 # ============================================================================
 # Run the application
 # ============================================================================
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("api:app", host="localhost", port=8000, reload=True)
+    # Auto-reload is for development only; main.py --production serves with workers
+    uvicorn.run("api:app", host="localhost", port=8000, reload=os.getenv("APP_ENV") != "production")
 
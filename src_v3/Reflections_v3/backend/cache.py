@@ -0,0 +1,267 @@
+"""
+In-process caches with cross-worker invalidation
+
+Every uvicorn worker keeps its own copy of the caches below. When one worker
+writes (new user, new topic, new reflection) it broadcasts the names of the
+caches that became stale, and every worker (itself included) clears them.
+
+Two broadcast channels are available:
+- PostgresBroadcast: LISTEN/NOTIFY on the application database (production)
+- LocalBroadcast:    in-process stand-in for a single worker and for tests
+"""
+import json
+import os
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+from sqlalchemy import event, text
+
+# ============================================================================
+# Settings
+# ============================================================================
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+CACHE_CHANNEL = os.getenv("CACHE_CHANNEL", "reflections_cache")
+# "postgres", "local" or empty (= postgres when the database is PostgreSQL)
+CACHE_BROADCAST = os.getenv("CACHE_BROADCAST", "")
+
+_caches: Dict[str, "InvalidatingCache"] = {}
+# Extra callbacks run when a cache name is invalidated (e.g. to mark an index stale)
+_listeners: Dict[str, list] = {}
+# Callbacks run for every broadcast message (e.g. live reflection events)
+_message_handlers: list = []
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+class InvalidatingCache:
+    """A small thread-safe TTL cache that can be cleared from any worker"""
+
+    def __init__(self, name: str, ttl: float = CACHE_TTL, maxsize: int = CACHE_MAXSIZE):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
+
+users_cache = InvalidatingCache("users")
+topics_cache = InvalidatingCache("topics")
+classifier_cache = InvalidatingCache("classifier")
+fragments_cache = InvalidatingCache("fragments")
+
+
+def clear_local(*names: str) -> None:
+    """Clear the named caches in this worker only"""
+    for name in names:
+        cache = _caches.get(name)
+        if cache is not None:
+            cache.clear()
+        for callback in _listeners.get(name, ()):
+            callback()
+
+
+def on_invalidate(name: str, callback: Callable[[], None]) -> None:
+    """Run callback in this worker whenever the named cache is invalidated"""
+    _listeners.setdefault(name, []).append(callback)
+
+
+# ============================================================================
+# Broadcast Channels
+# ============================================================================
+class LocalBroadcast:
+    """In-process broadcast, used for a single worker and in tests"""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        self._subscribers.append(callback)
+
+    def publish(self, message: dict, session=None) -> None:
+        for callback in list(self._subscribers):
+            callback(message)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PostgresBroadcast:
+    """Broadcast over Postgres LISTEN/NOTIFY
+
+    Needs a session-mode connection (direct or Session Pooler);
+    the Transaction Pooler does not deliver notifications.
+    """
+
+    def __init__(self, engine, channel: str = CACHE_CHANNEL, poll_interval: float = 1.0):
+        self.engine = engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._subscribers = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        self._subscribers.append(callback)
+
+    def publish(self, message: dict, session=None) -> None:
+        """Send a notification
+
+        When a session is given the NOTIFY joins its transaction, so other
+        workers only hear about the change once it is committed.
+        """
+        statement = text("SELECT pg_notify(:channel, :payload)")
+        params = {"channel": self.channel, "payload": json.dumps(message)}
+        if session is not None:
+            session.execute(statement, params)
+            return
+        with self.engine.connect() as conn:
+            conn.execute(statement, params)
+            conn.commit()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+            self._thread = None
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen_once()
+            except Exception as e:
+                # The connection dropped: everything cached may have missed
+                # an invalidation, so start from scratch and reconnect.
+                print(f"⚠️ cache listener reconnecting: {e}")
+                clear_local(*_caches)
+                self._stop.wait(self.poll_interval)
+
+    def _listen_once(self) -> None:
+        raw = self.engine.raw_connection()
+        try:
+            conn = getattr(raw, "driver_connection", None) or raw.connection
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN "{self.channel}"')
+            while not self._stop.is_set():
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self._dispatch(notify.payload)
+        finally:
+            raw.close()
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        for callback in list(self._subscribers):
+            callback(message)
+
+
+_broadcast = LocalBroadcast()
+
+
+def _on_message(message: dict) -> None:
+    clear_local(*message.get("caches", []))
+    for handler in list(_message_handlers):
+        handler(message)
+
+
+def on_message(handler: Callable[[dict], None]) -> None:
+    """Run handler(message) in this worker for every message published by any worker"""
+    _message_handlers.append(handler)
+
+
+def configure(engine) -> None:
+    """Pick the broadcast channel for this worker based on the engine"""
+    global _broadcast
+    kind = CACHE_BROADCAST or ("postgres" if engine.dialect.name == "postgresql" else "local")
+    _broadcast = PostgresBroadcast(engine) if kind == "postgres" else LocalBroadcast()
+    _broadcast.subscribe(_on_message)
+
+
+def get_broadcast():
+    return _broadcast
+
+
+def invalidate(*names: str, session=None) -> None:
+    """Clear the named caches here and in every other worker
+
+    Pass the write session to publish inside its transaction.
+    """
+    message = {"caches": list(names)}
+    if session is not None and not isinstance(_broadcast, PostgresBroadcast):
+        # Local delivery is immediate: clearing before the commit would let a
+        # concurrent refill cache the rows as they were before it
+        def send(_session):
+            clear_local(*names)
+            _broadcast.publish(message)
+        event.listen(session, "after_commit", send, once=True)
+        return
+    clear_local(*names)
+    _broadcast.publish(message, session=session)
+
+
+def publish(message: dict, session=None) -> None:
+    """Send a message to every worker (this one included), see on_message()
+
+    Pass the write session to publish inside its transaction.
+    """
+    _broadcast.publish(message, session=session)
+
+
+def start_listener() -> None:
+    _broadcast.start()
+
+
+def stop_listener() -> None:
+    _broadcast.stop()
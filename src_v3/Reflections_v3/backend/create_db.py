@@ -1,60 +1,206 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
-from urllib.parse import quote_plus
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import func, inspect, select, text, update
 
 # Import all models, including the new User model
-from models import Base, Topic, User
+from models import (
+    Base, Topic, User, Reflection, IdempotencyKey, summarize_text,
+    PARTITIONED, add_months, ensure_partitions, month_start, partition_name, upcoming_months
+)
+# Same DATABASE_URL handling as the API (PostgreSQL or tuned SQLite)
+from settings import SessionLocal, engine
 
-# Load environment variables from .env
 # ============================================================================
-# Load Environment Variables
+# Migrations for existing databases
 # ============================================================================
-load_dotenv()
-# SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
-
-# Fetch variables
-DB_USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
-if not DB_USER or not PASSWORD or not HOST or not PORT or not DBNAME:
-    print("❌ ERROR: one or more DB variables are not in .env file")
-    exit(1)
-# if password contain special character
-encoded_password = quote_plus(PASSWORD)
-# Construct the SQLAlchemy connection string
-DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{encoded_password}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
-# print(f"DATABASE_URL: {DATABASE_URL}")
-# Create the SQLAlchemy engine
-# engine = create_engine(DATABASE_URL)
-# If using Transaction Pooler or Session Pooler, we want to ensure we disable SQLAlchemy client side pooling -
-# https://docs.sqlalchemy.org/en/20/core/pooling.html#switching-pool-implementations
-engine = create_engine(DATABASE_URL, poolclass=NullPool)
-SessionLocal = sessionmaker(bind=engine)
-# Test the connection
-# try:
-#     with engine.connect() as connection:
-#         print("Connection successful!")
-# except Exception as e:
-#     print(f"Failed to connect: {e}")
+def add_summary_columns(batch_size: int = 500):
+    """Add reflections.excerpt / word_count to an existing table and backfill them"""
+    columns = {c["name"] for c in inspect(engine).get_columns("reflections")}
+    with engine.begin() as conn:
+        if "excerpt" not in columns:
+            conn.execute(text("ALTER TABLE reflections ADD COLUMN excerpt VARCHAR"))
+        if "word_count" not in columns:
+            conn.execute(text("ALTER TABLE reflections ADD COLUMN word_count INTEGER"))
+
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(Reflection.id, Reflection.text)
+                .where(Reflection.excerpt.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(update(Reflection), [{"id": r.id, **summarize_text(r.text)} for r in rows])
+            db.commit()
+    finally:
+        db.close()
+
+def add_timestamp_index():
+    """Index reflections.timestamp on tables created before it was declared"""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reflections_timestamp ON reflections (timestamp)"))
+
+def migrate_idempotency_keys():
+    """Bring idempotency_keys to the current layout: keys per user with a
+    request fingerprint, reflection_id NULL while a form is being classified"""
+    columns = {c["name"]: c for c in inspect(engine).get_columns("idempotency_keys")}
+    if "user_id" in columns and "request_hash" in columns and columns["reflection_id"]["nullable"]:
+        return
+    # The primary key changes; keys only live IDEMPOTENCY_TTL_HOURS, so start afresh
+    IdempotencyKey.__table__.drop(engine)
+    IdempotencyKey.__table__.create(engine)
 
 # ============================================================================
-# Database Setup
+# Monthly partitions (PostgreSQL, REFLECTIONS_PARTITIONED=1)
 # ============================================================================
-# engine = create_engine(SUPABASE_DB_URL)
-# SessionLocal = sessionmaker(bind=engine)
+# An existing unpartitioned table is kept here after its rows are copied
+UNPARTITIONED_SCHEMA = "reflections_unpartitioned"
+# Side tables that reference reflections by id
+SIDE_TABLES = ["reflection_signature_bands", "reflection_signatures", "idempotency_keys"]
+
+def is_partitioned() -> bool:
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('reflections'))"
+        )).scalar()
+
+def create_partitions(first: datetime | None = None):
+    """Create monthly partitions from the month of first up to PARTITION_MONTHS_AHEAD ahead"""
+    months = upcoming_months()
+    month = month_start(first) if first else months[0]
+    while month < months[0]:
+        months.append(month)
+        month = add_months(month, 1)
+    ensure_partitions(engine, months)
+
+def convert_to_partitioned():
+    """Move the existing tables aside, create the partitioned ones and copy the rows over
+
+    The old tables stay in the reflections_unpartitioned schema; drop it once
+    the copy is checked.
+    """
+    with engine.begin() as conn:
+        # Foreign keys to reflections.id would follow the moved table
+        inspector = inspect(conn)
+        for table in SIDE_TABLES:
+            if not inspector.has_table(table):
+                continue
+            for fk in inspector.get_foreign_keys(table):
+                if fk["referred_table"] == "reflections":
+                    conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{fk["name"]}"'))
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {UNPARTITIONED_SCHEMA}"))
+        for table in ("reflection_topics", "reflections"):
+            conn.execute(text(f"ALTER TABLE {table} SET SCHEMA {UNPARTITIONED_SCHEMA}"))
+        first = conn.execute(text(f"SELECT min(timestamp) FROM {UNPARTITIONED_SCHEMA}.reflections")).scalar()
+
+    Base.metadata.create_all(bind=engine)
+    create_partitions(first)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO reflections (id, title, text, excerpt, word_count, timestamp, user_id) "
+            f"SELECT id, title, text, excerpt, word_count, timestamp, user_id FROM {UNPARTITIONED_SCHEMA}.reflections"
+        ))
+        conn.execute(text(
+            "INSERT INTO reflection_topics (reflection_id, topic_id, reflection_timestamp) "
+            f"SELECT l.reflection_id, l.topic_id, r.timestamp FROM {UNPARTITIONED_SCHEMA}.reflection_topics l "
+            f"JOIN {UNPARTITIONED_SCHEMA}.reflections r ON r.id = l.reflection_id"
+        ))
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('reflections', 'id'), COALESCE((SELECT max(id) FROM reflections), 1))"
+        ))
+    print(f"✅ Copied reflections into monthly partitions; the old tables are in schema {UNPARTITIONED_SCHEMA}")
+
+def list_partitions():
+    """[(month, reflections partition, reflection_topics partition)], oldest first"""
+    with engine.connect() as conn:
+        names = conn.scalars(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('reflections')"
+        )).all()
+    partitions = []
+    for name in names:
+        match = re.fullmatch(r"reflections_y(\d{4})m(\d{2})", name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1).date()
+            partitions.append((month, name, partition_name("reflection_topics", month)))
+    return sorted(partitions)
+
+def drop_partitions_before(cutoff, detach_only: bool = False) -> int:
+    """Retention: remove the months that end on or before cutoff
+
+    Each month is detached from the parent tables (a catalog change, no row
+    by row DELETE) and then dropped, or kept as standalone tables with
+    detach_only. Side-table rows of those reflections are deleted first.
+    """
+    removed = 0
+    for month, reflections_part, links_part in list_partitions():
+        if add_months(month, 1) > cutoff:
+            break
+        with engine.begin() as conn:
+            for table in SIDE_TABLES:
+                conn.execute(text(f'DELETE FROM {table} WHERE reflection_id IN (SELECT id FROM "{reflections_part}")'))
+            conn.execute(text(f'ALTER TABLE reflection_topics DETACH PARTITION "{links_part}"'))
+            # The detached links still point at reflections, which would block detaching that month
+            for name in conn.scalars(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:t) AND contype = 'f'"
+            ), {"t": links_part}).all():
+                conn.execute(text(f'ALTER TABLE "{links_part}" DROP CONSTRAINT "{name}"'))
+            conn.execute(text(f'ALTER TABLE reflections DETACH PARTITION "{reflections_part}"'))
+            if not detach_only:
+                conn.execute(text(f'DROP TABLE "{links_part}", "{reflections_part}"'))
+        print(f"{'Detached' if detach_only else 'Dropped'} {reflections_part} and {links_part}")
+        removed += 1
+    return removed
+
+def setup_partitions():
+    if engine.dialect.name != "postgresql":
+        print("❌ ERROR: REFLECTIONS_PARTITIONED needs PostgreSQL")
+        sys.exit(1)
+    if not is_partitioned():
+        convert_to_partitioned()
+    with engine.connect() as conn:
+        first = conn.execute(select(func.min(Reflection.timestamp))).scalar()
+    create_partitions(first)
 
 # ============================================================================
 # Create Tables
 # ============================================================================
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create, migrate and maintain the database")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("partitions", help="create the monthly partitions for the coming months (run monthly)")
+    retention = commands.add_parser("retention", help="drop (or detach) old monthly partitions")
+    retention.add_argument("--keep-months", type=int, required=True, help="months to keep, including this one")
+    retention.add_argument("--detach-only", action="store_true", help="keep old months as standalone tables")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command and not PARTITIONED:
+        print("❌ ERROR: set REFLECTIONS_PARTITIONED=1 to manage partitions")
+        sys.exit(1)
+    if args.command == "partitions":
+        create_partitions()
+        print("✅ Partitions created")
+        sys.exit(0)
+    if args.command == "retention":
+        cutoff = add_months(month_start(datetime.now()), 1 - args.keep_months)
+        print(f"✅ Removed {drop_partitions_before(cutoff, args.detach_only)} monthly partitions before {cutoff}")
+        sys.exit(0)
+
     # This will now create the 'users' table and add the 'user_id'
     # column to the 'reflections' table automatically.
     Base.metadata.create_all(bind=engine)
+    add_summary_columns()
+    add_timestamp_index()
+    migrate_idempotency_keys()
+    if PARTITIONED:
+        setup_partitions()
     
     # Insert initial topics
     db = SessionLocal()
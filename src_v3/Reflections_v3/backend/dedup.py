@@ -0,0 +1,157 @@
+"""
+Near-duplicate detection for reflections (MinHash + LSH)
+
+Each reflection gets a MinHash signature over its word 3-shingles. The
+signature is cut into LSH bands that are stored in an indexed side table, so
+finding candidates is one indexed lookup; candidates are then scored by
+estimated Jaccard similarity of the full signatures.
+
+DUPLICATE_MODE decides what happens to a near-duplicate of the same user's
+recent reflections (last DUPLICATE_WINDOW_DAYS days):
+- "flag"   (default): stored, marked with duplicate_of, and its topics are
+           copied from the original instead of calling the classifier
+- "reject": refused (HTTP 409 / a bulk row error)
+- "off":   no detection
+"""
+import os
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from .models import ReflectionSignature, ReflectionSignatureBand
+
+DUPLICATE_MODE = os.getenv("DUPLICATE_MODE", "flag")
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", "30"))
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# A prime above 2**32; with a < 2**31 the products fit in uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(36)
+_A = _rng.integers(1, 2**31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**31, NUM_PERM, dtype=np.uint64)
+
+# Words in any script; a text with no word characters has no signature
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str) -> set:
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def signature(text: str) -> np.ndarray | None:
+    """MinHash signature: NUM_PERM minimum hash values (uint64)
+
+    None for a text without words: all such texts would share one signature
+    and flag each other as duplicates, so they are neither checked nor recorded.
+    """
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    if not len(hashes):
+        return None
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def band_keys(sig: np.ndarray) -> List[Tuple[int, int]]:
+    """(band, bucket) pairs; two signatures sharing any pair are candidates"""
+    return [
+        (band, zlib.crc32(sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets"""
+    return float(np.mean(a == b))
+
+
+def find_near_duplicates(db, items: List[Tuple[int, np.ndarray]]) -> List[Tuple[int, float] | None]:
+    """For each (user_id, signature): the best matching recent reflection of
+    the same user as (reflection_id, similarity), or None
+
+    One query for the candidates of all items, one for their signatures.
+    """
+    if not items:
+        return []
+    wanted: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, (user_id, sig) in enumerate(items):
+        for band, bucket in band_keys(sig):
+            wanted.setdefault((user_id, band, bucket), []).append(i)
+
+    cutoff = datetime.now() - timedelta(days=DUPLICATE_WINDOW_DAYS)
+    rows = db.execute(
+        select(
+            ReflectionSignatureBand.reflection_id,
+            ReflectionSignatureBand.user_id,
+            ReflectionSignatureBand.band,
+            ReflectionSignatureBand.bucket,
+        )
+        .join(ReflectionSignature, ReflectionSignature.reflection_id == ReflectionSignatureBand.reflection_id)
+        .where(
+            ReflectionSignatureBand.user_id.in_({user_id for user_id, _, _ in wanted}),
+            ReflectionSignatureBand.bucket.in_({bucket for _, _, bucket in wanted}),
+            ReflectionSignature.created_at >= cutoff,
+        )
+    ).all()
+
+    candidates: Dict[int, set] = {}
+    for reflection_id, user_id, band, bucket in rows:
+        for i in wanted.get((user_id, band, bucket), ()):
+            candidates.setdefault(i, set()).add(reflection_id)
+    if not candidates:
+        return [None] * len(items)
+
+    stored = dict(db.execute(
+        select(ReflectionSignature.reflection_id, ReflectionSignature.signature)
+        .where(ReflectionSignature.reflection_id.in_(set().union(*candidates.values())))
+    ).all())
+    results = []
+    for i, (_, sig) in enumerate(items):
+        best = None
+        for reflection_id in candidates.get(i, ()):
+            score = similarity(sig, np.frombuffer(stored[reflection_id], dtype=np.uint64))
+            if score >= DUPLICATE_THRESHOLD and (best is None or score > best[1]):
+                best = (reflection_id, score)
+        results.append(best)
+    return results
+
+
+def record_signatures(db, rows: List[dict]) -> None:
+    """Store signatures and bands for new reflections. Does not commit.
+
+    rows: dicts with reflection_id, user_id, signature and duplicate_of.
+    """
+    if not rows:
+        return
+    now = datetime.now()
+    db.execute(insert(ReflectionSignature), [
+        {
+            "reflection_id": r["reflection_id"],
+            "user_id": r["user_id"],
+            "created_at": now,
+            "signature": r["signature"].tobytes(),
+            "duplicate_of": r.get("duplicate_of"),
+        }
+        for r in rows
+    ])
+    db.execute(insert(ReflectionSignatureBand), [
+        {"reflection_id": r["reflection_id"], "band": band, "bucket": bucket, "user_id": r["user_id"]}
+        for r in rows
+        for band, bucket in band_keys(r["signature"])
+    ])
+
+
+def duplicate_of(db, reflection_id: int) -> int | None:
+    """The original of a flagged near-duplicate"""
+    return db.scalar(
+        select(ReflectionSignature.duplicate_of).where(ReflectionSignature.reflection_id == reflection_id)
+    )
@@ -0,0 +1,168 @@
+"""
+Live reflection events (server-sent events)
+
+The write path publishes "created" and "updated" events; they travel to
+every worker over the cache broadcast channel (Postgres NOTIFY in
+production, see backend/cache.py) and each worker fans them out to its
+open SSE connections, optionally filtered by user.
+
+An event carries what a list card shows (id, title, timestamp, user_id,
+topics), so pushing it to a browser needs no database read. Long titles
+are shortened (EVENT_TITLE_MAX) to keep it within NOTIFY's payload limit.
+
+Streams end as soon as the worker is told to stop (close_on_signal): uvicorn
+waits for open connections before running shutdown handlers, so an open
+stream would otherwise hold every shutdown to the graceful timeout.
+"""
+import asyncio
+import os
+import signal
+import threading
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import event as orm_event
+
+from . import cache
+
+# Events queued per connection before a slow client is disconnected
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+# Seconds between keep-alive comments on idle connections
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+EVENT_TYPES = ("created", "updated")
+# Titles are cut to this many characters: on PostgreSQL the event travels
+# through pg_notify inside the write transaction, and a payload of 8000
+# bytes or more would make the write itself fail
+EVENT_TITLE_MAX = 200
+_CLOSED = object()
+
+
+def reflection_event(kind: str, reflection_id: int, title: str, timestamp, user_id: int,
+                     topics: List[str]) -> dict:
+    return {
+        "type": kind,
+        "reflection": {
+            "id": reflection_id,
+            "title": title if len(title) <= EVENT_TITLE_MAX else title[:EVENT_TITLE_MAX - 1] + "…",
+            "timestamp": timestamp.isoformat(),
+            "user_id": user_id,
+            "topics": topics,
+        },
+    }
+
+
+class _Subscriber:
+    def __init__(self, user_id: int | None):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    def put(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too far behind: end the stream, the browser reconnects
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_CLOSED)
+
+
+class EventBroker:
+    """Fans events out to this worker's SSE connections"""
+
+    def __init__(self):
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def dispatch(self, event: dict) -> None:
+        """Deliver an event to matching subscribers (safe from any thread)"""
+        user_id = event["reflection"]["user_id"]
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.user_id in (None, user_id):
+                subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+
+    def close(self) -> None:
+        """End every open stream and refuse new ones (on shutdown)"""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.put, _CLOSED)
+
+    async def stream(self, user_id: int | None = None) -> AsyncIterator[Dict | None]:
+        """Yield events for one connection; None means "send a heartbeat" """
+        subscriber = _Subscriber(user_id)
+        with self._lock:
+            if self._closed:
+                return
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item is _CLOSED:
+                    return
+                yield item
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+broker = EventBroker()
+
+
+def close_on_signal() -> None:
+    """Close the broker on SIGINT/SIGTERM, then run the handler that was there
+
+    Call from inside the server's event loop, after the server installed its
+    own handlers (at startup). The broker is closed on the loop, not in the
+    handler itself, which may interrupt a thread holding the broker's lock.
+    """
+    loop = asyncio.get_running_loop()
+
+    def chain(previous):
+        def handler(sig, frame):
+            try:
+                loop.call_soon_threadsafe(broker.close)
+            except RuntimeError:  # loop already closed
+                pass
+            if callable(previous):
+                previous(sig, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(sig, signal.SIG_DFL)
+                signal.raise_signal(sig)
+        return handler
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, chain(signal.getsignal(sig)))
+        except ValueError:  # not the main thread (e.g. under a test client)
+            return
+
+
+def _on_message(message: dict) -> None:
+    event = message.get("event")
+    if event and event.get("type") in EVENT_TYPES:
+        broker.dispatch(event)
+
+
+cache.on_message(_on_message)
+
+
+def publish(event: dict, session=None) -> None:
+    """Send an event to the SSE connections of every worker
+
+    With a session, subscribers only hear about it once the session commits.
+    """
+    message = {"event": event}
+    if session is None or isinstance(cache.get_broadcast(), cache.PostgresBroadcast):
+        # NOTIFY inside the transaction is itself delivered on commit
+        cache.publish(message, session=session)
+    else:
+        orm_event.listen(session, "after_commit", lambda _: cache.publish(message), once=True)
@@ -0,0 +1,193 @@
+"""
+Streaming export of reflections with their topics (NDJSON, CSV, Parquet)
+
+Rows are read through a server-side cursor a chunk at a time, topic names
+are aggregated in SQL, and each chunk is serialized and sent before the next
+one is fetched, so memory stays constant however many rows are exported.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+from typing import Iterator, List
+
+import orjson
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from .models import PARTITIONED, Reflection, Topic, reflection_link_join, reflection_topics
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Same separator the bulk CSV import expects, so exports can be re-imported
+TOPIC_SEPARATOR = ";"
+EXPORT_COLUMNS = ["id", "title", "text", "timestamp", "user_id", "topics"]
+
+
+def _topic_names(dialect: str):
+    """Aggregate a reflection's topic names into a list (PostgreSQL array, SQLite JSON array)
+
+    A list, not a separated string, so names containing the separator survive.
+    """
+    if dialect == "postgresql":
+        return func.array_agg(aggregate_order_by(Topic.name, Topic.name)).filter(Topic.name.isnot(None))
+    return func.json_group_array(Topic.name)
+
+
+def export_query(dialect: str, user_id: int | None = None,
+                 since: datetime | None = None, until: datetime | None = None):
+    link_join = reflection_link_join
+    if PARTITIONED:
+        # Repeat the time range on the links, so their partitions are pruned as well
+        link_join = and_(
+            link_join,
+            *([reflection_topics.c.reflection_timestamp >= since] if since is not None else []),
+            *([reflection_topics.c.reflection_timestamp < until] if until is not None else [])
+        )
+    query = (
+        select(
+            Reflection.id,
+            Reflection.title,
+            Reflection.text,
+            Reflection.timestamp,
+            Reflection.user_id,
+            _topic_names(dialect).label("topics"),
+        )
+        .select_from(Reflection)
+        .outerjoin(reflection_topics, link_join)
+        .outerjoin(Topic, Topic.id == reflection_topics.c.topic_id)
+        .group_by(Reflection.id, Reflection.timestamp)
+        .order_by(Reflection.id)
+    )
+    if user_id is not None:
+        query = query.where(Reflection.user_id == user_id)
+    if since is not None:
+        query = query.where(Reflection.timestamp >= since)
+    if until is not None:
+        query = query.where(Reflection.timestamp < until)
+    return query
+
+
+def iter_chunks(db, user_id=None, since=None, until=None) -> Iterator[list]:
+    """Yield lists of rows from a server-side cursor; closes the session"""
+    try:
+        query = export_query(db.get_bind().dialect.name, user_id, since, until)
+        result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS))
+        for chunk in result.partitions():
+            yield chunk
+    finally:
+        db.close()
+
+
+def _topic_list(value) -> List[str]:
+    """Topic names from _topic_names(): a list already, or a JSON array text"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        # Reflections without topics aggregate the outer join's NULL: [null]
+        return sorted(t for t in orjson.loads(value) if t is not None)
+    return list(value)
+
+
+# ============================================================================
+# Serializers
+# ============================================================================
+def to_ndjson(chunks: Iterator[list]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield b"".join(
+            orjson.dumps({
+                "id": r.id,
+                "title": r.title,
+                "text": r.text,
+                "timestamp": r.timestamp.isoformat(),
+                "user_id": r.user_id,
+                "topics": _topic_list(r.topics),
+            }) + b"\n"
+            for r in chunk
+        )
+
+
+def to_csv(chunks: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        for r in chunk:
+            writer.writerow([r.id, r.title, r.text, r.timestamp.isoformat(), r.user_id,
+                             TOPIC_SEPARATOR.join(_topic_list(r.topics))])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def to_parquet(chunks: Iterator[list]) -> Iterator[bytes]:
+    """One Parquet row group per chunk (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("text", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("user_id", pa.int64()),
+        ("topics", pa.list_(pa.string())),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pydict({
+                "id": [r.id for r in chunk],
+                "title": [r.title for r in chunk],
+                "text": [r.text for r in chunk],
+                "timestamp": [r.timestamp for r in chunk],
+                "user_id": [r.user_id for r in chunk],
+                "topics": [_topic_list(r.topics) for r in chunk],
+            }, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+SERIALIZERS = {"ndjson": to_ndjson, "csv": to_csv, "parquet": to_parquet}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,209 @@
+"""
+Group commit for single reflection creates (optional, GROUP_COMMIT=1)
+
+When many users submit at once, each create paying for its own connection
+and commit dominates the cost. Instead, creates arriving within
+GROUP_COMMIT_MAX_WAIT_MS of each other (up to GROUP_COMMIT_MAX_BATCH) are
+written together: one connection, one transaction, multi-row inserts for
+reflections and reflection_topics (backend/ingest.py). Each caller still
+gets its own reflection_id or error.
+
+If the shared transaction fails as a whole (for example two workers racing
+on the same Idempotency-Key), every create in it is retried on its own.
+Nothing is retried once the transaction has committed: a failure after that
+point (a commit hook, the similarity index) is logged instead.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event as orm_event, insert, tuple_
+from starlette.concurrency import run_in_threadpool
+
+from .models import IdempotencyKey, Reflection
+from .ingest import BulkReflectionRow, insert_reflection_batch
+from .queries import select_reflections
+from .settings import SessionLocal
+from .similarity import get_index, reflection_document
+from . import cache, events
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv("GROUP_COMMIT_MAX_WAIT_MS", "5"))
+
+EVENT_FIELDS = ["id", "title", "timestamp", "user_id", "topics"]
+
+
+KEY_REUSED = "Idempotency-Key was already used for a different request"
+
+
+class _NotCommitted(Exception):
+    """The batch transaction failed as a whole; its creates are retried one by one"""
+
+
+def _error_status(message: str) -> int:
+    if message.startswith("User with id"):
+        return 404
+    if message == KEY_REUSED:
+        return 422
+    if message.startswith("near-duplicate"):
+        return 409
+    return 400
+
+
+class GroupCommitter:
+    """Coalesces concurrent creates in this worker's event loop"""
+
+    def __init__(self, fallback: Callable, idempotency_ttl: timedelta,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH, max_wait_ms: float = GROUP_COMMIT_MAX_WAIT_MS):
+        # fallback(reflection, idempotency_key, request_hash) -> reflection_id, the one-at-a-time path
+        self.fallback = fallback
+        self.idempotency_ttl = idempotency_ttl
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple] = []
+        self._timer = None
+        self._flushing = set()
+
+    async def submit(self, reflection, idempotency_key: str | None = None, request_hash: str | None = None) -> int:
+        """Queue a create and wait for its reflection_id (raises HTTPException on error)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((reflection, idempotency_key, request_hash, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush_now)
+        return await future
+
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            # Keep a reference until done, so the task is not garbage collected
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, batch: List[Tuple]) -> None:
+        try:
+            answers, created = await run_in_threadpool(self._write, batch)
+        except _NotCommitted:
+            for reflection, idempotency_key, request_hash, future in batch:
+                try:
+                    result = await run_in_threadpool(self.fallback, reflection, idempotency_key, request_hash)
+                except Exception as e:
+                    _resolve(future, error=e)
+                else:
+                    _resolve(future, result=result)
+            return
+        except Exception as e:
+            for *_, future in batch:
+                _resolve(future, error=e)
+            return
+        for (*_, future), (reflection_id, error) in zip(batch, answers):
+            if error:
+                _resolve(future, error=HTTPException(status_code=_error_status(error), detail=error))
+            else:
+                _resolve(future, result=reflection_id)
+
+        # Findable as related reflections right away in this worker
+        # (the reflections are committed: an index problem must not fail them)
+        try:
+            await run_in_threadpool(_index_created, created)
+        except Exception as e:
+            print(f"⚠️ similarity index update failed for reflections {[i for i, _ in created]}: {e}")
+
+    def _write(self, batch: List[Tuple]) -> Tuple[List[Tuple[int | None, str | None]], List[Tuple[int, str]]]:
+        """One transaction for the whole batch
+
+        Returns (reflection_id, error) per entry and (reflection_id, document)
+        per created reflection. Raises _NotCommitted if nothing was written.
+        """
+        # The same user and key twice in one batch is one create
+        first_with_key = {}
+        unique = []
+        for i, (reflection, key, _, _) in enumerate(batch):
+            if key is None or (reflection.user_id, key) not in first_with_key:
+                if key is not None:
+                    first_with_key[(reflection.user_id, key)] = i
+                unique.append(i)
+        db = SessionLocal()
+        committed = False
+
+        def on_commit(_):
+            nonlocal committed
+            committed = True
+
+        # Registered before the publish/invalidate hooks, so it runs first
+        orm_event.listen(db, "after_commit", on_commit)
+        try:
+            rows = [BulkReflectionRow(**batch[i][0].model_dump()) for i in unique]
+            results = insert_reflection_batch(db, rows)
+            created = [(i, reflection_id) for i, (reflection_id, _) in zip(unique, results) if reflection_id]
+            if created:
+                now = datetime.now()
+                keys = [
+                    {"user_id": batch[i][0].user_id, "key": batch[i][1], "request_hash": batch[i][2],
+                     "reflection_id": reflection_id, "created_at": now, "expires_at": now + self.idempotency_ttl}
+                    for i, reflection_id in created if batch[i][1]
+                ]
+                if keys:
+                    db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+                    # Pending reservations of these keys (see api.db_reserve_idempotency_key)
+                    db.execute(delete(IdempotencyKey).where(
+                        tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(
+                            [(k["user_id"], k["key"]) for k in keys]
+                        ),
+                        IdempotencyKey.reflection_id.is_(None)
+                    ))
+                    db.execute(insert(IdempotencyKey.__table__), keys)
+                ids = [reflection_id for _, reflection_id in created]
+                for r in select_reflections(db, EVENT_FIELDS, Reflection.id.in_(ids)):
+                    events.publish(events.reflection_event(
+                        "created", r["id"], r["title"], r["timestamp"], r["user_id"], r["topics"]
+                    ), session=db)
+                cache.invalidate("fragments", "reflections", session=db)
+            db.commit()
+        except Exception as e:
+            if not committed:
+                raise _NotCommitted() from e
+            # Only a commit hook (event publish, cache invalidation) failed
+            print(f"⚠️ post-commit hook failed for a group commit batch: {e}")
+        finally:
+            db.close()
+
+        by_unique = dict(zip(unique, results))
+        answers = []
+        for i, (reflection, key, request_hash, _) in enumerate(batch):
+            if i in by_unique:
+                answers.append(by_unique[i])
+                continue
+            first = first_with_key[(reflection.user_id, key)]
+            if batch[first][2] != request_hash:
+                answers.append((None, KEY_REUSED))
+            else:
+                answers.append(by_unique[first])
+        created = [(reflection_id, reflection_document(row.title, row.text))
+                   for row, (reflection_id, _) in zip(rows, results) if reflection_id]
+        return answers, created
+
+
+def _index_created(created: List[Tuple[int, str]]) -> None:
+    index = get_index()
+    for reflection_id, document in created:
+        index.add(reflection_id, document)
+
+
+def _resolve(future, result=None, error=None) -> None:
+    # The caller may have gone away (request cancelled) in the meantime
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,244 @@
+"""
+Streaming bulk import of reflections (NDJSON or CSV)
+
+The request body is parsed line by line as it arrives and written in
+batches: one user check, one near-duplicate lookup, one topic upsert, one
+multi-row reflection insert and one multi-row link insert per batch.
+Per-row results are spooled to a temporary file, so memory stays flat
+however large the upload is.
+"""
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import insert, select
+
+from .models import Reflection, User, ensure_partitions, reflection_topics, summarize_text, topic_link
+from .topics import upsert_topics
+from .dedup import (
+    DUPLICATE_MODE,
+    DUPLICATE_THRESHOLD,
+    band_keys,
+    find_near_duplicates,
+    record_signatures,
+    signature,
+    similarity
+)
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+# Results beyond this many bytes are spooled to disk
+BULK_RESULTS_SPOOL_BYTES = 1024 * 1024
+# Topics inside a CSV cell are separated by this character
+CSV_TOPIC_SEPARATOR = ";"
+
+
+class BulkReflectionRow(BaseModel):
+    title: str
+    text: str
+    timestamp: datetime
+    user_id: int
+    topics: List[str] = Field(default_factory=list)
+
+
+# ============================================================================
+# Parsing
+# ============================================================================
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into text lines"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """Yield (row_number, dict or error message) for each NDJSON line"""
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, f"invalid JSON: {e}"
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """Yield (row_number, dict or error message) for each CSV record
+
+    The first record is the header (title,text,timestamp,user_id,topics).
+    Quoted fields may span several lines.
+    """
+    header = None
+    row = 0
+    pending = ""
+    async for line in lines:
+        pending = f"{pending}\n{line}" if pending else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        data = dict(zip(header, values))
+        data["topics"] = [t.strip() for t in data.get("topics", "").split(CSV_TOPIC_SEPARATOR) if t.strip()]
+        yield row, data
+    if pending:
+        yield row + 1, "unterminated quoted field"
+
+
+def parse_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    if fmt == "csv":
+        return iter_csv(lines)
+    return iter_ndjson(lines)
+
+
+def validate_row(data) -> Tuple[BulkReflectionRow | None, str | None]:
+    if isinstance(data, str):
+        return None, data
+    if not isinstance(data, dict):
+        return None, "expected an object"
+    try:
+        return BulkReflectionRow(**data), None
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(p) for p in error["loc"])
+        return None, f"{field}: {error['msg']}"
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+def _find_duplicates(db, rows: List[BulkReflectionRow], positions: List[int]):
+    """Near-duplicates among the rows at positions, against the database and
+    earlier rows of the same batch
+
+    Returns ({position: signature}, {position: ("db", reflection_id) or ("batch", position)}).
+    Rows without words get no signature and are never duplicates.
+    """
+    signatures = {i: sig for i in positions if (sig := signature(rows[i].text)) is not None}
+    positions = list(signatures)
+    matches = find_near_duplicates(db, [(rows[i].user_id, signatures[i]) for i in positions])
+    duplicates = {}
+    seen: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, match in zip(positions, matches):
+        keys = [(rows[i].user_id, band, bucket) for band, bucket in band_keys(signatures[i])]
+        if match is not None:
+            duplicates[i] = ("db", match[0])
+        else:
+            earlier = {j for key in keys for j in seen.get(key, ())}
+            scored = [(similarity(signatures[i], signatures[j]), j) for j in earlier]
+            best = max(scored, default=None)
+            if best and best[0] >= DUPLICATE_THRESHOLD:
+                duplicates[i] = ("batch", best[1])
+        if DUPLICATE_MODE == "reject" and i in duplicates:
+            continue  # rejected rows are not originals for later rows
+        for key in keys:
+            seen.setdefault(key, []).append(i)
+    return signatures, duplicates
+
+
+def insert_reflection_batch(db, rows: List[BulkReflectionRow]) -> List[Tuple[int | None, str | None]]:
+    """Insert reflections and their topic links with multi-row statements
+
+    Near-duplicates are flagged (and reuse the original's topics when they
+    have none) or rejected, depending on DUPLICATE_MODE.
+    Returns (reflection_id, error) per input row, in order. Does not commit.
+    """
+    if not rows:
+        return []
+    ensure_partitions(db.get_bind(), (r.timestamp for r in rows))
+
+    user_ids = {r.user_id for r in rows}
+    known_users = set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+    errors = {i: f"User with id {r.user_id} not found" for i, r in enumerate(rows) if r.user_id not in known_users}
+
+    signatures, duplicates = {}, {}
+    if DUPLICATE_MODE != "off":
+        signatures, duplicates = _find_duplicates(db, rows, [i for i in range(len(rows)) if i not in errors])
+        if DUPLICATE_MODE == "reject":
+            for i, (kind, original) in duplicates.items():
+                errors[i] = (f"near-duplicate of reflection {original}" if kind == "db"
+                             else "near-duplicate of an earlier row in this upload")
+
+    valid = [i for i in range(len(rows)) if i not in errors]
+    if not valid:
+        return [(None, errors[i]) for i in range(len(rows))]
+
+    topic_ids = upsert_topics(db, (t for i in valid for t in rows[i].topics))
+    new_ids = list(db.scalars(
+        insert(Reflection.__table__).returning(Reflection.__table__.c.id, sort_by_parameter_order=True),
+        [
+            {"title": rows[i].title, "text": rows[i].text, "timestamp": rows[i].timestamp,
+             "user_id": rows[i].user_id, **summarize_text(rows[i].text)}
+            for i in valid
+        ],
+    ))
+    id_of = dict(zip(valid, new_ids))
+    original_id = {i: (original if kind == "db" else id_of[original])
+                   for i, (kind, original) in duplicates.items() if i in id_of}
+
+    # Topic ids per row; a duplicate without topics reuses its original's
+    row_topics = {i: {topic_ids[t] for t in rows[i].topics if t in topic_ids} for i in valid}
+    db_originals = {original for kind, original in duplicates.values() if kind == "db"}
+    original_topics: Dict[int, set] = {}
+    if db_originals:
+        for reflection_id, topic_id in db.execute(
+            select(reflection_topics.c.reflection_id, reflection_topics.c.topic_id)
+            .where(reflection_topics.c.reflection_id.in_(db_originals))
+        ):
+            original_topics.setdefault(reflection_id, set()).add(topic_id)
+    for i, (kind, original) in duplicates.items():
+        if i in row_topics and not row_topics[i]:
+            row_topics[i] = original_topics.get(original, set()) if kind == "db" else row_topics[original]
+
+    links = [topic_link(id_of[i], topic_id, rows[i].timestamp) for i in valid for topic_id in row_topics[i]]
+    if links:
+        db.execute(insert(reflection_topics), links)
+
+    if signatures:
+        record_signatures(db, [
+            {"reflection_id": id_of[i], "user_id": rows[i].user_id,
+             "signature": signatures[i], "duplicate_of": original_id.get(i)}
+            for i in valid if i in signatures
+        ])
+
+    return [(id_of[i], None) if i in id_of else (None, errors[i]) for i in range(len(rows))]
+
+
+class ResultSpool:
+    """NDJSON per-row results, kept in memory up to a limit then on disk"""
+
+    def __init__(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=BULK_RESULTS_SPOOL_BYTES, mode="w+b")
+        self.counts: Dict[str, int] = {"created": 0, "error": 0}
+
+    def write(self, result: dict) -> None:
+        self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+        self._file.write(json.dumps(result).encode("utf-8") + b"\n")
+
+    def iter_and_close(self, chunk_size: int = 64 * 1024):
+        try:
+            self._file.seek(0)
+            while chunk := self._file.read(chunk_size):
+                yield chunk
+            yield json.dumps({"summary": self.counts}).encode("utf-8") + b"\n"
+        finally:
+            self._file.close()
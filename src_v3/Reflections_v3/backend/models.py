@@ -1,17 +1,67 @@
 """
 Database models
+
+With REFLECTIONS_PARTITIONED=1 (PostgreSQL only) reflections and
+reflection_topics are range partitioned by month on the reflection
+timestamp; see the partitioning section at the end of this file.
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Table, ForeignKey
-from sqlalchemy.orm import relationship, declarative_base
+import os
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, DateTime, Text, LargeBinary, Table, ForeignKey,
+    ForeignKeyConstraint, Index, and_, event, text
+)
+from sqlalchemy.orm import relationship, declarative_base, deferred
 
 Base = declarative_base()
 
-reflection_topics = Table(
-    'reflection_topics',
-    Base.metadata,
-    Column('reflection_id', Integer, ForeignKey('reflections.id'), primary_key=True),
-    Column('topic_id', Integer, ForeignKey('topics.id'), primary_key=True)
-)
+PARTITIONED = os.getenv("REFLECTIONS_PARTITIONED", "").lower() in ("1", "true", "yes")
+
+# List views show this many characters of a reflection instead of the full text
+EXCERPT_LENGTH = 200
+
+def summarize_text(text: str) -> dict:
+    """The stored excerpt and word count for a reflection text"""
+    excerpt = " ".join(text.split())
+    if len(excerpt) > EXCERPT_LENGTH:
+        excerpt = excerpt[:EXCERPT_LENGTH].rsplit(" ", 1)[0] + "…"
+    return {"excerpt": excerpt, "word_count": len(text.split())}
+
+if PARTITIONED:
+    # Links carry their reflection's timestamp, so they live in the same
+    # month as the reflection and are dropped together with it
+    reflection_topics = Table(
+        'reflection_topics',
+        Base.metadata,
+        Column('reflection_id', Integer, primary_key=True),
+        Column('topic_id', Integer, ForeignKey('topics.id'), primary_key=True),
+        Column('reflection_timestamp', DateTime, primary_key=True),
+        ForeignKeyConstraint(['reflection_id', 'reflection_timestamp'], ['reflections.id', 'reflections.timestamp']),
+        postgresql_partition_by='RANGE (reflection_timestamp)'
+    )
+else:
+    reflection_topics = Table(
+        'reflection_topics',
+        Base.metadata,
+        Column('reflection_id', Integer, ForeignKey('reflections.id'), primary_key=True),
+        Column('topic_id', Integer, ForeignKey('topics.id'), primary_key=True)
+    )
+
+def topic_link(reflection_id: int, topic_id: int, timestamp: datetime) -> dict:
+    """A reflection_topics row (partitioned links also carry the reflection timestamp)"""
+    if PARTITIONED:
+        return {"reflection_id": reflection_id, "topic_id": topic_id, "reflection_timestamp": timestamp}
+    return {"reflection_id": reflection_id, "topic_id": topic_id}
+
+def _reflection_fk():
+    """Foreign key to reflections.id for side tables
+
+    A partitioned reflections table has no unique key on id alone, so side
+    tables are cleaned up by the retention job instead.
+    """
+    return () if PARTITIONED else (ForeignKey('reflections.id'),)
 
 # ============================================================================
 # NEW USER MODEL
@@ -34,10 +84,14 @@ class Topic(Base):
 
 class Reflection(Base):
     __tablename__ = "reflections"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     title = Column(String, nullable=False)
-    text = Column(Text, nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    # The full text is only loaded when accessed; list views use excerpt/word_count
+    text = deferred(Column(Text, nullable=False))
+    excerpt = Column(String, nullable=True)
+    word_count = Column(Integer, nullable=True)
+    # Part of the primary key when partitioned (the partition key must be)
+    timestamp = Column(DateTime, primary_key=PARTITIONED, nullable=False, index=True)
     
     # ========================================================================
     # ADDED USER ID FOREIGN KEY
@@ -49,4 +103,115 @@ class Reflection(Base):
     user = relationship("User", back_populates="reflections")
     
     # This relationship is unchanged
-    topic_list = relationship("Topic", secondary=reflection_topics, back_populates="reflections")
\ No newline at end of file
+    topic_list = relationship("Topic", secondary=reflection_topics, back_populates="reflections")
+
+    # Objects are identified by id alone, also when the table key includes timestamp
+    __mapper_args__ = {"primary_key": [id]}
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"} if PARTITIONED else {}
+
+# reflection_topics joined to reflections (by month too when partitioned, so both sides are pruned)
+reflection_link_join = and_(
+    reflection_topics.c.reflection_id == Reflection.id,
+    *([reflection_topics.c.reflection_timestamp == Reflection.timestamp] if PARTITIONED else [])
+)
+
+
+@event.listens_for(Reflection, "before_insert")
+def _fill_summary(mapper, connection, reflection):
+    """ORM inserts get their excerpt and word count computed here
+    (bulk inserts pass summarize_text() values themselves)"""
+    if reflection.excerpt is None:
+        for key, value in summarize_text(reflection.text).items():
+            setattr(reflection, key, value)
+
+
+# ============================================================================
+# IDEMPOTENCY KEYS
+# ============================================================================
+class IdempotencyKey(Base):
+    """Remembers which reflection a client-supplied key produced,
+    so a retried or double-submitted create returns the same reflection.
+    Keys are per user; request_hash fingerprints the request that used the
+    key, so reusing it for a different request is refused instead of
+    answered with the first reflection. reflection_id is NULL while the
+    form is still being classified."""
+    __tablename__ = "idempotency_keys"
+    # No foreign key: a form for an unknown user must still get its 404
+    # from the create, not a failed reservation
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    reflection_id = Column(Integer, *_reflection_fk(), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# ============================================================================
+# NEAR-DUPLICATE SIGNATURES
+# ============================================================================
+class ReflectionSignature(Base):
+    """MinHash signature of a reflection (see backend/dedup.py)"""
+    __tablename__ = "reflection_signatures"
+    reflection_id = Column(Integer, *_reflection_fk(), primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    signature = Column(LargeBinary, nullable=False)
+    # Set when the reflection was flagged as a near-duplicate of an earlier one
+    duplicate_of = Column(Integer, nullable=True)
+
+class ReflectionSignatureBand(Base):
+    """LSH bands of a signature: reflections sharing a (band, bucket) are candidates"""
+    __tablename__ = "reflection_signature_bands"
+    reflection_id = Column(Integer, ForeignKey('reflection_signatures.reflection_id'), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    __table_args__ = (Index("ix_signature_bands_lookup", "user_id", "band", "bucket"),)
+
+
+# ============================================================================
+# MONTHLY PARTITIONS (PostgreSQL, REFLECTIONS_PARTITIONED=1)
+# ============================================================================
+# Partitions are created this many months ahead (and on demand for older months)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITIONED_TABLES = ["reflections", "reflection_topics"]
+
+_known_months = set()
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    """reflections, 2025-03 -> reflections_y2025m03"""
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def upcoming_months(months_ahead: int = PARTITION_MONTHS_AHEAD) -> list:
+    this_month = month_start(datetime.now())
+    return [add_months(this_month, i) for i in range(months_ahead + 1)]
+
+def ensure_partitions(engine, timestamps: Iterable[datetime]) -> None:
+    """Create the monthly partitions (reflections and links) these timestamps fall into
+
+    Cheap to call on every write: months already seen by this worker are
+    skipped. Runs in its own short transaction, so call it before the write
+    session touches reflections.
+    """
+    if not PARTITIONED:
+        return
+    months = {month_start(t) for t in timestamps} - _known_months
+    if not months:
+        return
+    with engine.begin() as connection:
+        # Serializes partition creation between workers
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('reflection_partitions'))"))
+        for month in sorted(months):
+            for table in PARTITIONED_TABLES:
+                connection.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+    _known_months.update(months)
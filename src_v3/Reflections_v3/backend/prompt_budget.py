@@ -0,0 +1,152 @@
+"""
+Token budget for classifier input
+
+Long journal entries are reduced before they are sent to the LLM, so
+classification cost and latency stay bounded:
+- tokens are counted locally (tiktoken when installed, otherwise a close
+  word/punctuation estimate),
+- text over CLASSIFIER_TOKEN_BUDGET is reduced with CLASSIFIER_REDUCER:
+  "extractive" keeps the highest scoring sentences (term weights computed
+  with NumPy over the whole text), "headtail" keeps the beginning and end.
+
+python -m benchmarks.bench_classifier_input compares both on a fixture set.
+"""
+import math
+import os
+import re
+from typing import List
+
+import numpy as np
+
+from .similarity import STOPWORDS, TOKEN_RE
+
+try:
+    import tiktoken
+except ImportError:  # optional: the estimate below is used instead
+    tiktoken = None
+
+CLASSIFIER_TOKEN_BUDGET = int(os.getenv("CLASSIFIER_TOKEN_BUDGET", "1000"))
+CLASSIFIER_REDUCER = os.getenv("CLASSIFIER_REDUCER", "extractive")
+# Share of a head/tail window given to the head
+HEAD_SHARE = 0.7
+# Characters per token assumed by the estimate (without tiktoken)
+CHARS_PER_TOKEN = 4
+OMISSION = " […] "
+
+SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family
+    except Exception:
+        _encoding = None
+
+
+# ============================================================================
+# Counting
+# ============================================================================
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # BPE vocabularies keep common words whole and split long ones into
+    # pieces of about four characters; punctuation is a token of its own
+    return sum(max(1, math.ceil(len(p) / CHARS_PER_TOKEN)) if p[0].isalnum() or p[0] == "_" else 1
+               for p in _PIECE_RE.findall(text))
+
+
+# ============================================================================
+# Reducing
+# ============================================================================
+def head_tail(text: str, budget: int) -> str:
+    """The start and the end of the text, about budget tokens together"""
+    # The omission marker is sent too
+    budget = max(budget - count_tokens(OMISSION), 0)
+    if _encoding is not None:
+        tokens = _encoding.encode(text)
+        head = int(budget * HEAD_SHARE)
+        tail = budget - head
+        return _encoding.decode(tokens[:head]) + OMISSION + _encoding.decode(tokens[len(tokens) - tail:])
+
+    words = text.split(" ")
+    costs = [count_tokens(w) for w in words]
+    head, used = 0, 0
+    while head < len(words) and used + costs[head] <= budget * HEAD_SHARE:
+        used += costs[head]
+        head += 1
+    tail = len(words)
+    while tail > head and used + costs[tail - 1] <= budget:
+        tail -= 1
+        used += costs[tail]
+    if head == 0 or tail == len(words):
+        # A single "word" over budget (CJK without spaces, a long URL): cut by characters
+        head_budget = int(budget * HEAD_SHARE)
+        return (_cut_chars(text, head_budget) + OMISSION
+                + _cut_chars(text, budget - head_budget, from_end=True))
+    return " ".join(words[:head]) + OMISSION + " ".join(words[tail:])
+
+
+def _cut_chars(text: str, budget: int, from_end: bool = False) -> str:
+    """At most budget tokens from the start (or the end) of text, cut by characters"""
+    piece = text[len(text) - budget * CHARS_PER_TOKEN:] if from_end else text[:budget * CHARS_PER_TOKEN]
+    # Punctuation costs a token per character: shrink until the estimate fits
+    while piece and (cost := count_tokens(piece)) > budget:
+        keep = len(piece) * budget // cost
+        piece = piece[len(piece) - keep:] if from_end else piece[:keep]
+    return piece
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_RE.findall(text) if s.strip()]
+
+
+def extractive_summary(text: str, budget: int) -> str:
+    """The sentences that best cover the text's main terms, in their original order
+
+    An entry keeps coming back to what it is about, so a term weighs the log
+    of how often it occurs in the whole text (once: nothing). A sentence
+    scores the sum of its terms' weights divided by the square root of its
+    length, so long sentences do not win by size alone.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) < 2:
+        return head_tail(text, budget)
+
+    terms = [[t for t in TOKEN_RE.findall(s.lower()) if t not in STOPWORDS] for s in sentences]
+    vocabulary = {t: i for i, t in enumerate(dict.fromkeys(t for ts in terms for t in ts))}
+    if not vocabulary:
+        return head_tail(text, budget)
+
+    # One (sentence, term) pair per occurrence: memory grows with the text,
+    # not with sentences x vocabulary
+    rows = np.repeat(np.arange(len(sentences)), [len(ts) for ts in terms])
+    columns = np.fromiter((vocabulary[t] for ts in terms for t in ts), dtype=np.int64, count=len(rows))
+    weights = np.log(np.bincount(columns, minlength=len(vocabulary)))
+    lengths = np.maximum(np.bincount(rows, minlength=len(sentences)), 1)
+    # Each term counts once per sentence
+    pairs = np.unique(rows * len(vocabulary) + columns)
+    scores = np.bincount(pairs // len(vocabulary), weights=weights[pairs % len(vocabulary)],
+                         minlength=len(sentences)) / np.sqrt(lengths)
+    # The opening usually says what the entry is about
+    scores[0] *= 1.5
+
+    costs = [count_tokens(s) for s in sentences]
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        if used + costs[i] + 1 <= budget:
+            chosen.append(i)
+            used += costs[i] + 1
+    if not chosen:
+        return head_tail(text, budget)
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+REDUCERS = {"extractive": extractive_summary, "headtail": head_tail}
+
+
+def fit_to_budget(text: str, budget: int = CLASSIFIER_TOKEN_BUDGET, reducer: str = CLASSIFIER_REDUCER) -> str:
+    """The text itself if it is within budget tokens, otherwise a reduced version"""
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text
+    return REDUCERS[reducer](text, budget)
@@ -0,0 +1,63 @@
+"""
+Read queries that return plain rows instead of ORM objects
+
+The API serializes these rows straight to JSON, so no ORM object is
+hydrated (and no identity map is filled) on the read path.
+"""
+from typing import List
+
+from sqlalchemy import select
+
+from .models import Reflection, Topic, User, reflection_link_join, reflection_topics
+
+USER_COLUMNS = [User.id, User.firstname, User.email]
+TOPIC_COLUMNS = [Topic.id, Topic.name]
+
+# Reflection fields a client can ask for with ?fields=a,b,c ("topics" is joined separately)
+REFLECTION_FIELDS = {
+    "id": Reflection.id,
+    "title": Reflection.title,
+    "text": Reflection.text,
+    "excerpt": Reflection.excerpt,
+    "word_count": Reflection.word_count,
+    "timestamp": Reflection.timestamp,
+    "user_id": Reflection.user_id,
+}
+# List views (no full text) and detail views
+SUMMARY_FIELDS = ["id", "title", "excerpt", "word_count", "timestamp", "user_id", "topics"]
+FULL_FIELDS = ["id", "title", "text", "timestamp", "user_id", "topics"]
+FIELD_PRESETS = {"summary": SUMMARY_FIELDS, "full": FULL_FIELDS}
+
+
+def select_users(db, *criteria):
+    """Users as (id, firstname, email) rows"""
+    return db.execute(select(*USER_COLUMNS).where(*criteria).order_by(User.id)).all()
+
+
+def select_topics(db, *criteria):
+    """Topics as (id, name) rows"""
+    return db.execute(select(*TOPIC_COLUMNS).where(*criteria).order_by(Topic.id)).all()
+
+
+def select_reflections(db, fields: List[str], *criteria) -> List[dict]:
+    """Reflections as dicts with only the given fields
+
+    One query for the columns, plus one for topic names if asked for.
+    Criteria on Reflection.timestamp let PostgreSQL skip whole partitions.
+    """
+    columns = [REFLECTION_FIELDS[f] for f in fields if f != "topics"]
+    rows = db.execute(select(*columns).where(*criteria).order_by(Reflection.id)).all()
+    if "topics" not in fields:
+        return [row._asdict() for row in rows]
+
+    links = (
+        select(reflection_topics.c.reflection_id, Topic.name)
+        .join(Topic, Topic.id == reflection_topics.c.topic_id)
+    )
+    if criteria:
+        # The same criteria (not a list of ids), so link partitions are pruned too
+        links = links.join(Reflection, reflection_link_join).where(*criteria)
+    topics = {}
+    for reflection_id, name in db.execute(links):
+        topics.setdefault(reflection_id, []).append(name)
+    return [{**row._asdict(), "topics": topics.get(row.id, [])} for row in rows]
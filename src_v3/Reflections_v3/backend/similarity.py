@@ -0,0 +1,299 @@
+"""
+Local similarity index for "related reflections"
+
+Each reflection becomes a hashed word n-gram vector (unigrams + bigrams,
+sublinear term frequency, L2 normalized) stored as one row of a float16
+NumPy matrix. Cosine similarity is then a single matrix-vector product.
+
+- Persistence: append-only vectors / signatures / ids files in
+  SIMILARITY_INDEX_DIR, opened with mmap so startup does not read the whole
+  index.
+- Updates: new reflections are added in memory as they are created; other
+  workers catch up from the database when a "reflections" invalidation
+  arrives (see backend/cache.py). The index is saved every
+  SIMILARITY_SAVE_EVERY additions and on shutdown.
+- Approximate search: above SIMILARITY_EXACT_LIMIT rows, candidates are
+  preselected by Hamming distance of 64-bit random-hyperplane signatures
+  and only those are scored exactly.
+"""
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, no file locking
+    fcntl = None
+
+from .models import Reflection
+from . import cache
+
+SIMILARITY_INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR", "data/similarity")
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", "512"))
+SIMILARITY_EXACT_LIMIT = int(os.getenv("SIMILARITY_EXACT_LIMIT", "50000"))
+SIMILARITY_SAVE_EVERY = int(os.getenv("SIMILARITY_SAVE_EVERY", "100"))
+# Rows scored at a time, so the float16 -> float32 upcast stays small
+_BLOCK_ROWS = 65536
+SIGNATURE_BITS = 64
+# Ids fetched at a time when sync() scans the table
+SYNC_ID_BATCH = 10000
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = set("""
+a an and are as at be but by for from had has have i i'm in is it it's its me my of on or
+so that the this to was we were with you your today just very really about
+""".split())
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# ============================================================================
+# Vectorizing
+# ============================================================================
+def features(text: str) -> List[str]:
+    tokens = [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def vectorize(text: str, dim: int = SIMILARITY_DIM) -> np.ndarray:
+    """Hashed n-gram vector (float32, unit length; all zeros for empty text)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    counts = Counter(zlib.crc32(f.encode("utf-8")) for f in features(text))
+    for h, count in counts.items():
+        # The top bit picks the sign, so hash collisions tend to cancel out
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dim] += sign * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _planes(dim: int) -> np.ndarray:
+    return np.random.default_rng(603).standard_normal((dim, SIGNATURE_BITS)).astype(np.float32)
+
+
+# ============================================================================
+# Index
+# ============================================================================
+def _open_rows(path: str, dtype, row_shape: tuple = ()) -> np.ndarray:
+    """Memory-map a raw append-only file as an array of whole rows"""
+    row_bytes = np.dtype(dtype).itemsize * int(np.prod(row_shape, dtype=np.int64))
+    rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+    if rows == 0:
+        return np.zeros((0,) + row_shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,) + row_shape)
+
+
+class SimilarityIndex:
+    def __init__(self, directory: str = SIMILARITY_INDEX_DIR, dim: int = SIMILARITY_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._planes = _planes(dim)
+        self._lock = threading.RLock()
+        # Saved part (memory-mapped) and rows added since the last save
+        self._vectors = np.zeros((0, dim), dtype=np.float16)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._signatures = np.zeros((0, SIGNATURE_BITS // 8), dtype=np.uint8)
+        self._new_vectors: List[np.ndarray] = []
+        self._new_ids: List[int] = []
+        self._new_signatures: List[np.ndarray] = []
+        self._known = set()
+        self._stale = True
+
+    def __len__(self):
+        return len(self._ids) + len(self._new_ids)
+
+    def _path(self, name: str) -> str:
+        # The dimension is part of the file name: changing it starts a new index
+        return os.path.join(self.directory, f"{name}.{self.dim}.bin")
+
+    # --- persistence ---
+
+    def load(self) -> None:
+        """Open the saved index (memory-mapped), if there is one"""
+        with self._lock:
+            # ids are appended last, so they tell how many rows are complete
+            ids = _open_rows(self._path("ids"), np.int64)
+            n = len(ids)
+            self._ids = ids
+            self._vectors = _open_rows(self._path("vectors"), np.float16, (self.dim,))[:n]
+            self._signatures = _open_rows(self._path("signatures"), np.uint8, (SIGNATURE_BITS // 8,))[:n]
+            self._known.update(ids.tolist())
+
+    def save(self) -> None:
+        """Append rows added since the last save to the files on disk
+
+        Workers share the files: a lock file serializes writers, and rows
+        another worker already appended are skipped.
+        """
+        with self._lock:
+            if not self._new_ids:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "lock"), "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                on_disk = _open_rows(self._path("ids"), np.int64)
+                n = len(on_disk)
+                appended_by_others = set(on_disk[len(self._ids):].tolist())
+                keep = [i for i, rid in enumerate(self._new_ids) if rid not in appended_by_others]
+                parts = [
+                    ("vectors", self._new_vectors, np.float16, (self.dim,)),
+                    ("signatures", self._new_signatures, np.uint8, (SIGNATURE_BITS // 8,)),
+                    ("ids", self._new_ids, np.int64, ()),  # last: it marks the rows as complete
+                ]
+                for name, new, dtype, row_shape in parts if keep else ():
+                    rows = np.asarray([new[i] for i in keep], dtype=dtype)
+                    row_bytes = np.dtype(dtype).itemsize * int(np.prod(row_shape, dtype=np.int64))
+                    with open(self._path(name), "ab") as f:
+                        # Drop a partial tail left by a writer that died mid-append
+                        f.truncate(n * row_bytes)
+                        f.write(rows.tobytes())
+                del on_disk
+            self._new_vectors, self._new_ids, self._new_signatures = [], [], []
+            self.load()
+
+    # --- updates ---
+
+    def add(self, reflection_id: int, text: str) -> None:
+        with self._lock:
+            if reflection_id in self._known:
+                return
+            vector = vectorize(text, self.dim)
+            self._new_vectors.append(vector.astype(np.float16))
+            self._new_signatures.append(np.packbits(vector @ self._planes > 0))
+            self._new_ids.append(reflection_id)
+            self._known.add(reflection_id)
+            if len(self._new_ids) >= SIMILARITY_SAVE_EVERY:
+                self.save()
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def sync(self, db, batch_size: int = 1000) -> None:
+        """Add reflections from the database that the index has not seen yet
+
+        Every id is compared with the ids already indexed, so rows other
+        workers committed out of id order are found however old their id.
+        Only ids are scanned; title and text are read for the missing ones,
+        so catching up after this worker's own writes transfers no text.
+        """
+        with self._lock:
+            if not self._stale:
+                return
+            self._stale = False
+        try:
+            ids = db.scalars(select(Reflection.id).execution_options(yield_per=SYNC_ID_BATCH))
+            missing = []
+            for rid in ids:
+                if rid not in self._known:
+                    missing.append(rid)
+            for start in range(0, len(missing), batch_size):
+                rows = db.execute(
+                    select(Reflection.id, Reflection.title, Reflection.text)
+                    .where(Reflection.id.in_(missing[start:start + batch_size]))
+                )
+                for row in rows:
+                    self.add(row.id, reflection_document(row.title, row.text))
+        except Exception:
+            self._stale = True
+            raise
+
+    # --- search ---
+
+    def vector_for(self, reflection_id: int) -> np.ndarray | None:
+        with self._lock:
+            if reflection_id in self._new_ids:
+                return self._new_vectors[self._new_ids.index(reflection_id)].astype(np.float32)
+            positions = np.flatnonzero(self._ids == reflection_id)
+            if len(positions):
+                return np.asarray(self._vectors[positions[0]], dtype=np.float32)
+            return None
+
+    def search(self, vector: np.ndarray, k: int = 5, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """The k most similar reflections as (reflection_id, cosine similarity)"""
+        with self._lock:
+            parts = [(self._vectors, self._ids, self._signatures)]
+            if self._new_ids:
+                parts.append((
+                    np.stack(self._new_vectors),
+                    np.asarray(self._new_ids, dtype=np.int64),
+                    np.stack(self._new_signatures),
+                ))
+            approximate = len(self) > SIMILARITY_EXACT_LIMIT
+
+        exclude = set(exclude)
+        wanted = k + len(exclude)
+        query = vector.astype(np.float32)
+        candidates = []  # (score, reflection_id)
+        for vectors, ids, signatures in parts:
+            if not len(ids):
+                continue
+            if approximate:
+                # Keep the rows whose signatures differ in the fewest bits
+                signature = np.packbits(query @ self._planes > 0)
+                distances = _POPCOUNT[np.bitwise_xor(signatures, signature)].sum(axis=1)
+                keep = min(len(ids), max(wanted * 20, 200))
+                rows = np.argpartition(distances, keep - 1)[:keep]
+                scores = np.asarray(vectors[np.sort(rows)], dtype=np.float32) @ query
+                row_ids = np.asarray(ids)[np.sort(rows)]
+            else:
+                scores = np.concatenate([
+                    np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32) @ query
+                    for start in range(0, len(ids), _BLOCK_ROWS)
+                ])
+                row_ids = np.asarray(ids)
+            top = np.argsort(-scores)[:wanted]
+            candidates.extend(zip(scores[top].tolist(), row_ids[top].tolist()))
+
+        candidates.sort(reverse=True)
+        return [(rid, score) for score, rid in candidates if rid not in exclude and score > 0][:k]
+
+
+def reflection_document(title: str, text: str) -> str:
+    return f"{title}\n{text}"
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SimilarityIndex:
+    """The worker's index, opened from disk on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+            _index.load()
+            # Other workers created reflections: catch up on the next query
+            cache.on_invalidate("reflections", _index.mark_stale)
+        return _index
+
+
+def build_index_in_background(session_factory) -> None:
+    """Open the index and catch up with the database in a background thread
+
+    The first build reads every reflection; doing it at startup keeps that
+    out of the first related-reflections request.
+    """
+    def build():
+        db = session_factory()
+        try:
+            get_index().sync(db)
+        except Exception as e:
+            print(f"⚠️ similarity index build failed: {e}")
+        finally:
+            db.close()
+
+    threading.Thread(target=build, name="similarity-index", daemon=True).start()
+
+
+def save_index() -> None:
+    if _index is not None:
+        _index.save()
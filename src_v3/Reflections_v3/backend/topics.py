@@ -0,0 +1,263 @@
+"""
+Topic helpers shared by the single and bulk write paths
+
+Every topic name is canonicalized before it is stored: case, whitespace and
+separators are normalized, and names that are near matches of an existing
+topic ("Parenting", "parents", "parent") map to that topic instead of
+creating a new one. Near matches are found with an in-memory trigram index
+(the same similarity measure as Postgres pg_trgm) and must also be the same
+words up to inflection ("parents", "parenting"), so "mental health" stays
+apart from "health" and "topic1" from "topic0".
+
+To fold together duplicates that already exist:
+python -m backend.topics merge [--dry-run]
+"""
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import Topic, reflection_topics
+from . import cache
+
+# Trigram similarity at or above which two topics are the same topic
+# (when their words also match, see same_words)
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.5"))
+
+
+def insert_ignore(db, table):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's database"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return pg_insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
+# ============================================================================
+# Canonicalization
+# ============================================================================
+def normalize_topic(name: str) -> str:
+    """'  Parenting_Tips ' -> 'parenting tips'"""
+    name = re.sub(r"[\s_\-]+", " ", name.lower())
+    return name.strip(" .,;:!?'\"()[]{}")
+
+
+def trigrams(name: str) -> set:
+    """pg_trgm style trigrams: each word padded with two spaces in front, one behind"""
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+# Longest first: "ings" before "s"
+_SUFFIXES = ("ings", "ing", "ers", "er", "es", "ed", "s", "e")
+
+
+def word_stem(word: str) -> str:
+    """'parenting' / 'parents' -> 'parent', 'running' -> 'run' (rough, English only)"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)]
+            break
+    # running -> runn -> run
+    if len(word) > 3 and word[-1] == word[-2] and word[-1].isalpha() and word[-1] not in "aeiouls":
+        word = word[:-1]
+    return word
+
+
+def same_words(a: str, b: str) -> bool:
+    """Two normalized names with the same words, up to inflection
+
+    Trigram similarity alone would fold "mental health" into "health" or
+    "topic1" into "topic0"; names only merge when no word is added or changed.
+    """
+    a_words, b_words = a.split(), b.split()
+    return len(a_words) == len(b_words) and all(
+        word_stem(x) == word_stem(y) for x, y in zip(a_words, b_words)
+    )
+
+
+class TopicIndex:
+    """Trigram index over canonical topic names (safe to share between threads)"""
+
+    def __init__(self, names: Iterable[str] = (), threshold: float = TOPIC_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._grams: Dict[str, set] = {}
+        self._postings: Dict[str, set] = defaultdict(set)
+        self._by_normal: Dict[str, str] = {}
+        # Bulk imports and group commits canonicalize from threadpool threads
+        self._lock = threading.RLock()
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self._add(name)
+
+    def _add(self, name: str) -> None:
+        normal = normalize_topic(name)
+        if not normal or normal in self._by_normal:
+            return
+        self._by_normal[normal] = name
+        grams = trigrams(normal)
+        self._grams[normal] = grams
+        for gram in grams:
+            self._postings[gram].add(normal)
+
+    def match(self, name: str) -> str | None:
+        """The stored topic name that best matches, or None"""
+        with self._lock:
+            return self._match(name)
+
+    def _match(self, name: str) -> str | None:
+        normal = normalize_topic(name)
+        if normal in self._by_normal:
+            return self._by_normal[normal]
+        grams = trigrams(normal)
+        if not grams:
+            return None
+
+        # Only names sharing at least one trigram are candidates
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+
+        best, best_key = None, None
+        for candidate, common in shared.items():
+            score = common / (len(grams) + len(self._grams[candidate]) - common)
+            if score < self.threshold or not same_words(normal, candidate):
+                continue
+            # Ties go to the shorter (more general) topic
+            key = (score, -len(candidate))
+            if best_key is None or key > best_key:
+                best, best_key = candidate, key
+        return self._by_normal[best] if best is not None else None
+
+    def canonical(self, name: str) -> str:
+        """Map a name to an existing topic, or register it as a new one"""
+        with self._lock:
+            existing = self._match(name)
+            if existing is not None:
+                return existing
+            normal = normalize_topic(name)
+            self._add(normal)
+            return normal
+
+
+def _load_index(db) -> TopicIndex:
+    return TopicIndex(db.scalars(select(Topic.name)))
+
+
+def canonicalize_topics(db, names: Iterable[str]) -> Dict[str, str]:
+    """Return {name: canonical topic name} for the given names"""
+    # The index is cached per worker and rebuilt when topics change
+    index = cache.topics_cache.get_or_load("index", lambda: _load_index(db))
+    canonical = {}
+    for name in names:
+        if name and normalize_topic(name) and name not in canonical:
+            canonical[name] = index.canonical(name)
+    return canonical
+
+
+def upsert_topics(db, names: Iterable[str]) -> Dict[str, int]:
+    """Return {name: topic_id} for all names, creating the missing ones
+
+    Names are canonicalized first, so near duplicates share one topic.
+    Two SELECTs and one multi-row INSERT, however many names are given.
+    """
+    canonical = canonicalize_topics(db, names)
+    wanted = list(dict.fromkeys(canonical.values()))
+    if not wanted:
+        return {}
+
+    topic_ids = dict(db.execute(select(Topic.name, Topic.id).where(Topic.name.in_(wanted))).all())
+    missing = [n for n in wanted if n not in topic_ids]
+    if missing:
+        db.execute(insert_ignore(db, Topic.__table__), [{"name": n} for n in missing])
+        topic_ids.update(db.execute(select(Topic.name, Topic.id).where(Topic.name.in_(missing))).all())
+        cache.invalidate("topics", session=db)
+    return {name: topic_ids[c] for name, c in canonical.items()}
+
+
+# ============================================================================
+# Merging existing duplicates
+# ============================================================================
+def find_duplicate_topics(db) -> Dict[int, List[int]]:
+    """Group existing topics into {canonical_id: [duplicate_ids]}
+
+    The most used topic of a group is kept.
+    """
+    usage = (
+        select(Topic.id, Topic.name, func.count(reflection_topics.c.reflection_id).label("uses"))
+        .outerjoin(reflection_topics, reflection_topics.c.topic_id == Topic.id)
+        .group_by(Topic.id, Topic.name)
+        .order_by(func.count(reflection_topics.c.reflection_id).desc(), Topic.id)
+    )
+    index = TopicIndex()
+    id_by_name = {}
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for topic_id, name, _ in db.execute(usage):
+        match = index.match(name)
+        if match is None:
+            index.add(name)
+            id_by_name[name] = topic_id
+        else:
+            groups[id_by_name[match]].append(topic_id)
+    return dict(groups)
+
+
+def merge_duplicate_topics(db, groups: Dict[int, List[int]]) -> int:
+    """Repoint reflection_topics rows to the canonical topics and delete
+    the duplicates, with set-based statements per group. Does not commit."""
+    merged = 0
+    for canonical_id, duplicate_ids in groups.items():
+        # Every link column but topic_id is copied (partitioned links carry a timestamp)
+        kept = [c for c in reflection_topics.c if c.name != "topic_id"]
+        db.execute(
+            insert_ignore(db, reflection_topics).from_select(
+                [c.name for c in kept] + ["topic_id"],
+                select(*kept, literal(canonical_id))
+                .where(reflection_topics.c.topic_id.in_(duplicate_ids))
+                .distinct()
+            )
+        )
+        db.execute(delete(reflection_topics).where(reflection_topics.c.topic_id.in_(duplicate_ids)))
+        db.execute(delete(Topic.__table__).where(Topic.id.in_(duplicate_ids)))
+        merged += len(duplicate_ids)
+    if merged:
+        cache.invalidate("topics", "classifier", "fragments", session=db)
+    return merged
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "merge":
+        print("usage: python -m backend.topics merge [--dry-run]")
+        sys.exit(1)
+
+    from .api import SessionLocal
+
+    db = SessionLocal()
+    try:
+        groups = find_duplicate_topics(db)
+        names = dict(db.execute(select(Topic.id, Topic.name)).all())
+        for canonical_id, duplicate_ids in groups.items():
+            print(f"{names[canonical_id]} <- {', '.join(names[i] for i in duplicate_ids)}")
+        if "--dry-run" in sys.argv:
+            print(f"Dry run: {sum(len(d) for d in groups.values())} topics would be merged")
+        else:
+            merged = merge_duplicate_topics(db, groups)
+            db.commit()
+            print(f"✅ Merged {merged} duplicate topics")
+    finally:
+        db.close()
@@ -0,0 +1 @@
+# This empty file tells Python this is a module.
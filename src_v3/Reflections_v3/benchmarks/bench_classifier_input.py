@@ -0,0 +1,92 @@
+"""
+Classifier input size: full text vs token-budgeted text
+
+For every fixture in benchmarks/classifier_fixtures.py and each reducer
+(extractive, headtail) it reports:
+- tokens sent for the reflection text, before and after reduction,
+- time spent reducing,
+- keyword recall: share of the fixture's topic keywords still present
+  in the text the classifier sees (a quality proxy needing no LLM).
+
+With --llm (and OPENAI_API_KEY set) each text is also classified, and the
+topic overlap with the full-text topics and with the expected topics is
+reported. That makes real, paid API calls.
+
+To run (from the app root): python -m benchmarks.bench_classifier_input [budget] [--llm]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from backend.prompt_budget import REDUCERS, count_tokens, fit_to_budget
+from backend.similarity import TOKEN_RE
+from benchmarks.classifier_fixtures import FIXTURES, fixture_text
+
+
+def keyword_recall(text: str, keywords) -> float:
+    words = set(TOKEN_RE.findall(text.lower()))
+    # "run" should match "running", "paint" should match "painting"
+    found = [k for k in keywords if any(w.startswith(k) for w in words)]
+    return len(found) / len(keywords)
+
+
+def overlap(a, b) -> float:
+    a = {t.lower() for t in a}
+    b = {t.lower() for t in b}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def reduce_all(budget: int) -> dict:
+    results = {"full": []}
+    for fixture in FIXTURES:
+        text = fixture_text(fixture)
+        results["full"].append({"text": text, "tokens": count_tokens(text), "seconds": 0.0})
+    for reducer in REDUCERS:
+        results[reducer] = []
+        for fixture in FIXTURES:
+            text = fixture_text(fixture)
+            start = time.perf_counter()
+            reduced = fit_to_budget(text, budget, reducer)
+            seconds = time.perf_counter() - start
+            results[reducer].append({"text": reduced, "tokens": count_tokens(reduced), "seconds": seconds})
+    return results
+
+
+async def classify_all(results: dict) -> None:
+    from backend.classifier import classify_reflection_topics
+
+    for name, rows in results.items():
+        for fixture, row in zip(FIXTURES, rows):
+            row["topics"] = await classify_reflection_topics(fixture["title"], row["text"], [])
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    budget = int(args[0]) if args else 200
+    use_llm = "--llm" in sys.argv
+
+    results = reduce_all(budget)
+    if use_llm:
+        asyncio.run(classify_all(results))
+
+    full_tokens = sum(r["tokens"] for r in results["full"])
+    print(f"{len(FIXTURES)} fixtures, budget {budget} tokens, {full_tokens} tokens of full text")
+    for name, rows in results.items():
+        tokens = sum(r["tokens"] for r in rows)
+        recall = statistics.mean(keyword_recall(r["text"], f["keywords"]) for f, r in zip(FIXTURES, rows))
+        reduce_ms = statistics.mean(r["seconds"] for r in rows) * 1000
+        line = (f"{name:<11} tokens {tokens:6d}  saved {1 - tokens / full_tokens:6.1%}"
+                f"  keyword recall {recall:6.1%}  reduce {reduce_ms:6.2f} ms/text")
+        if use_llm:
+            vs_full = statistics.mean(overlap(r["topics"], full["topics"])
+                                      for r, full in zip(rows, results["full"]))
+            vs_expected = statistics.mean(overlap(r["topics"], f["topics"]) for f, r in zip(FIXTURES, rows))
+            line += f"  topics vs full {vs_full:6.1%}  vs expected {vs_expected:6.1%}"
+        print(line)
+    if not use_llm:
+        print("Add --llm (needs OPENAI_API_KEY) to compare classified topics too")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Per-request database latency: tuned SQLite vs default SQLite vs PostgreSQL
+
+Each "request" opens a session, runs what one API call runs and closes it:
+- read:  one user's reflection list (summary fields + topics)
+- write: insert one reflection and commit
+
+SQLite runs on a temporary file. To include PostgreSQL (e.g. Supabase),
+point BENCH_POSTGRES_URL at an EMPTY scratch database: the tables are
+created there and rows are added.
+To run (from the app root): python -m benchmarks.bench_database [requests]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# backend.settings builds engines for DATABASE_URL on import; no .env is needed here
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from backend.models import Base, Reflection
+from backend.queries import SUMMARY_FIELDS, select_reflections
+from backend.settings import create_engines
+from benchmarks.bench_serialization import WORDS, seed
+
+SEED_ROWS = 2000
+
+
+def read_request(Session):
+    db = Session()
+    try:
+        select_reflections(db, SUMMARY_FIELDS, Reflection.user_id == random.randint(1, 10))
+    finally:
+        db.close()
+
+
+def write_request(Session):
+    db = Session()
+    try:
+        db.add(Reflection(title="Benchmark", text=" ".join(random.choices(WORDS, k=150)),
+                          timestamp=datetime.now(), user_id=random.randint(1, 10)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(Session, fn, requests: int) -> dict:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        fn(Session)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {"median": statistics.median(timings), "p95": timings[int(len(timings) * 0.95) - 1]}
+
+
+def run(name: str, engine, read_engine, requests: int):
+    Base.metadata.create_all(bind=engine)
+    seed(sessionmaker(bind=engine), SEED_ROWS)
+    results = {
+        "read": measure(sessionmaker(bind=read_engine), read_request, requests),
+        "write": measure(sessionmaker(bind=engine), write_request, requests),
+    }
+    for kind, r in results.items():
+        print(f"{name:<16} {kind:<6} median {r['median'] * 1000:8.2f} ms   p95 {r['p95'] * 1000:8.2f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{requests} requests each, {SEED_ROWS} reflections seeded")
+    with tempfile.TemporaryDirectory() as directory:
+        default_engine = create_engine(f"sqlite:///{os.path.join(directory, 'default.db')}")
+        run("sqlite default", default_engine, default_engine, requests)
+        tuned = run("sqlite tuned", *create_engines(f"sqlite:///{os.path.join(directory, 'tuned.db')}"), requests)
+
+    postgres_url = os.getenv("BENCH_POSTGRES_URL")
+    if postgres_url:
+        remote = run("postgres", *create_engines(postgres_url), requests)
+        for kind in ("read", "write"):
+            ratio = remote[kind]["median"] / tuned[kind]["median"]
+            print(f"{kind}: tuned SQLite is {ratio:.1f}x faster per request (median)")
+    else:
+        print("Set BENCH_POSTGRES_URL to compare with PostgreSQL")
@@ -0,0 +1,102 @@
+"""
+Per-row cost of serializing reflection reads, before and after
+
+Before: ORM objects (topic_list loaded per row) -> dict -> jsonable_encoder -> json
+After:  Row tuples from backend/queries.py -> orjson
+
+Uses an in-memory SQLite database, so no .env is needed.
+To run (from the app root): python -m benchmarks.bench_serialization [rows]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import Base, Reflection, Topic, User, reflection_topics, summarize_text
+from backend.queries import FULL_FIELDS, select_reflections
+
+WORDS = "today I learned about patience focus family waves code habits sleep running music".split()
+
+
+def seed(Session, rows: int):
+    db = Session()
+    try:
+        db.execute(insert(User), [{"firstname": f"user{i}", "email": f"user{i}@test.com"} for i in range(10)])
+        db.execute(insert(Topic), [{"name": f"topic {i}"} for i in range(50)])
+        start = datetime(2025, 1, 1)
+        reflections = []
+        for i in range(rows):
+            text = " ".join(random.choices(WORDS, k=150))
+            reflections.append({
+                "title": f"Reflection {i}",
+                "text": text,
+                "timestamp": start + timedelta(hours=i),
+                "user_id": i % 10 + 1,
+                **summarize_text(text),
+            })
+        db.execute(insert(Reflection), reflections)
+        db.execute(insert(reflection_topics), [
+            {"reflection_id": i + 1, "topic_id": topic_id}
+            for i in range(rows)
+            for topic_id in random.sample(range(1, 51), 3)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def before(db) -> bytes:
+    reflections = db.query(Reflection).all()
+    data = [
+        {
+            "id": r.id,
+            "title": r.title,
+            "text": r.text,
+            "timestamp": r.timestamp,
+            "user_id": r.user_id,
+            "topics": [t.name for t in r.topic_list]
+        }
+        for r in reflections
+    ]
+    return json.dumps(jsonable_encoder(data)).encode("utf-8")
+
+
+def after(db) -> bytes:
+    return orjson.dumps(select_reflections(db, FULL_FIELDS))
+
+
+def measure(Session, fn, repeat: int = 5) -> float:
+    """Best wall time over a few runs, each with a fresh session"""
+    best = float("inf")
+    for _ in range(repeat):
+        db = Session()
+        try:
+            started = time.perf_counter()
+            fn(db)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            db.close()
+    return best
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    seed(Session, rows)
+
+    results = {"before (ORM + jsonable_encoder + json)": measure(Session, before),
+               "after  (Row tuples + orjson)": measure(Session, after)}
+    print(f"{rows} reflections, 3 topics each")
+    for name, seconds in results.items():
+        print(f"{name}: {seconds * 1000:8.1f} ms total, {seconds / rows * 1e6:6.1f} µs/row")
+    old, new = results.values()
+    print(f"speedup: {old / new:.1f}x")
@@ -0,0 +1,123 @@
+"""
+Long reflections with the topics a reader would give them
+
+keywords are words that carry each fixture's topics; they are spread over
+the whole entry (not only its start), as in real journal entries.
+"""
+FIXTURES = [
+    {
+        "title": "A hard week at work",
+        "topics": ["work", "stress", "sleep"],
+        "keywords": ["deadline", "manager", "sleep", "anxious", "project", "insomnia"],
+        "paragraphs": [
+            "This week the release deadline moved up by ten days and the whole team scrambled. "
+            "My manager asked me to take over the billing project on Monday, on top of everything else.",
+            "I spent most evenings answering messages after dinner. Even when the laptop was closed "
+            "I kept rehearsing the standup in my head. The kids noticed I was distracted during bath time.",
+            "On Wednesday we had the quarterly review. It went fine, better than I expected actually, "
+            "and a colleague thanked me in front of everyone for fixing the invoices bug last month.",
+            "The weather was grey all week. I skipped my Tuesday run because of the rain and then felt "
+            "guilty about it. The coffee machine on our floor broke, which did not help the mood.",
+            "Lunch was mostly at the desk. I tried the new ramen place with Priya on Thursday, which was "
+            "nice, we talked about her trip to Lisbon and her plans to repaint the kitchen.",
+            "I have been lying awake until two or three most nights. The insomnia is back, like last spring. "
+            "I feel anxious in the morning before I even open email, a tight chest and a racing mind.",
+            "Friday was calmer. We shipped a first version of the billing project and nothing broke. "
+            "I left at five and we ordered pizza, and I watched half a film before falling asleep on the couch.",
+            "Next week I want to protect my sleep: no screens after ten, and tell my manager the deadline "
+            "for the second phase is not realistic without another engineer.",
+        ],
+    },
+    {
+        "title": "Sunday with my daughter",
+        "topics": ["parenting", "family", "patience"],
+        "keywords": ["daughter", "tantrum", "patience", "parent", "grandma", "bedtime"],
+        "paragraphs": [
+            "We started the day at the farmers market. The strawberries were early this year and very sweet, "
+            "and the man selling honey remembered us from last summer.",
+            "My daughter had a huge tantrum at the playground when it was time to leave. She threw her shoe "
+            "into the sandbox and refused to walk. Other parents were watching and I felt my face go hot.",
+            "I managed not to yell. I sat down next to her and waited, which felt like forever but was maybe "
+            "five minutes. Patience is not my strong suit, so I am counting this as a win.",
+            "In the afternoon we drove to see grandma. The traffic on the ring road was awful, there was an "
+            "accident near the exit and we sat still for twenty minutes listening to the same three songs.",
+            "Grandma made her apple cake and told the story about my father falling into the pond when he was six. "
+            "My daughter laughed so hard she got hiccups. It is good to see them together.",
+            "On the way home I thought about how my own parents handled meltdowns. Mostly with silence. "
+            "I want to be a different kind of parent, one who names the feeling instead of punishing it.",
+            "Bedtime took an hour. Two books, a glass of water, a question about whether fish sleep, "
+            "and then she wanted the hallway light on. I said yes to all of it.",
+            "I am tired but it was a good Sunday. Tomorrow the routine starts again.",
+        ],
+    },
+    {
+        "title": "Training for the half marathon",
+        "topics": ["running", "health", "goals"],
+        "keywords": ["marathon", "run", "knee", "pace", "training", "physiotherapist"],
+        "paragraphs": [
+            "Twelve weeks until the half marathon. I printed the training plan and stuck it on the fridge, "
+            "which makes it feel real and slightly terrifying.",
+            "This morning's run was eight kilometres along the river. The first half felt heavy, the second "
+            "half felt great. My pace was about six minutes per kilometre, a little faster than planned.",
+            "Work has been quiet, which helps. We moved offices and the new building has showers, so I can "
+            "run at lunch. The desk situation is still chaotic and nobody knows where the printer went.",
+            "My sister called about the holiday plans. We might rent a cabin in the mountains in August "
+            "if everyone can agree on dates, which in our family is never a given.",
+            "My left knee started aching after the long run on Saturday. I booked an appointment with a "
+            "physiotherapist for Thursday because I do not want a repeat of the injury two years ago.",
+            "I have been cooking more: lentil soup, roasted vegetables, a lot of rice. I am trying to eat "
+            "enough before long runs instead of going out on an empty stomach.",
+            "The physiotherapist said the knee is just overloaded, not injured. Strength exercises three "
+            "times a week, and keep the easy runs truly easy.",
+            "Goal for the race: finish under two hours and enjoy it. Goal for the training: stay healthy.",
+        ],
+    },
+    {
+        "title": "Money worries",
+        "topics": ["finances", "budgeting", "anxiety"],
+        "keywords": ["rent", "budget", "savings", "debt", "spending", "worried"],
+        "paragraphs": [
+            "The landlord sent a letter: the rent goes up by twelve percent in September. I read it twice "
+            "standing in the hallway before I took my coat off.",
+            "I finally sat down and wrote a real budget in a spreadsheet, every subscription and every "
+            "coffee. Seeing it all in one place was worse than I thought.",
+            "The neighbours had a party on Saturday and I went for an hour. Nice people, too much loud music, "
+            "and a long conversation about whether the new tram line will ever open.",
+            "My car needs new tyres before winter. That is another four hundred that is not in the budget. "
+            "The credit card debt from the move is still not paid off either.",
+            "I keep checking my banking app several times a day. I am worried in a low, constant way that "
+            "colours everything else, even the good parts of the week.",
+            "On the bright side, the garden is doing well. The tomatoes are finally red and the basil has "
+            "gone wild. I gave a big bunch to the neighbours to say thanks for the party.",
+            "Plan: cancel three subscriptions, cook at home on weekdays, move fifty a month into savings "
+            "even if it is small, and pay the card down before anything else.",
+            "Writing down the spending made it feel more manageable. Less a cloud, more a list.",
+        ],
+    },
+    {
+        "title": "Learning to paint again",
+        "topics": ["creativity", "art", "self-care"],
+        "keywords": ["paint", "watercolour", "canvas", "creative", "art", "sketch"],
+        "paragraphs": [
+            "I bought a small watercolour set last week, the first since art school. It sat on the "
+            "shelf for four days before I opened it.",
+            "The commute has been slow because of the roadworks on the bridge. I started listening to a "
+            "podcast about ancient history to make it bearable, episodes about Rome mostly.",
+            "On Saturday morning I made tea, put on some music and tried to paint the view from the window: "
+            "the rooftops, the chimney, the crooked television antenna. The first attempt was muddy.",
+            "My friend Tom came over for dinner. We talked about his new job at the hospital and his plan to "
+            "adopt a dog, probably a greyhound, which I think would suit his apartment perfectly.",
+            "The second painting was better. I let the paper dry between layers instead of rushing. "
+            "Being creative again feels like looking after a part of myself I had ignored.",
+            "I carry a little sketch book now and draw people waiting at the bus stop. Nobody has noticed "
+            "yet, or they are polite enough to pretend.",
+            "Next month there is an evening art class at the community centre, eight weeks, oils on canvas. "
+            "I signed up before I could talk myself out of it.",
+            "It is not about being good. It is about the hour where I am not thinking about anything else.",
+        ],
+    },
+]
+
+
+def fixture_text(fixture: dict) -> str:
+    return "\n\n".join(fixture["paragraphs"])
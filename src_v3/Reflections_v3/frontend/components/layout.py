@@ -6,6 +6,9 @@ def PageLayout(title: str, *content):
     return Html(
         Head(
             Title(title),
+            # htmx and its SSE extension (live updates on the reflections list)
+            Script(src="https://cdn.jsdelivr.net/npm/htmx.org@2.0.7/dist/htmx.min.js"),
+            Script(src="https://cdn.jsdelivr.net/npm/htmx-ext-sse@2.2.3/dist/sse.min.js"),
             Style("""
                 body {
                     font-family: system-ui, -apple-system, sans-serif;
@@ -1,9 +1,10 @@
 from fasthtml.common import *
 from datetime import datetime
+from starlette.concurrency import run_in_threadpool
 from .layout import PageLayout
 
 # Import backend DB functions
-from backend.api import db_get_reflection, db_get_user
+from backend.api import db_get_reflection, db_get_related_reflections, db_get_user
 
 async def render_reflection_detail_page(reflection_id: int):
     """
@@ -18,6 +19,14 @@ async def render_reflection_detail_page(reflection_id: int):
     except Exception:
         return PageLayout("Not Found", H1("Reflection not found."))
 
+    # The page still renders if the similarity index is unavailable
+    try:
+        # Index sync reads the database and memory-mapped files: off the event loop
+        related = await run_in_threadpool(db_get_related_reflections, reflection_id)
+    except Exception as e:
+        print(f"⚠️ related reflections unavailable: {e}")
+        related = []
+
     return PageLayout(
         reflection['title'],
         H1(reflection['title']),
@@ -29,5 +38,16 @@ async def render_reflection_detail_page(reflection_id: int):
         Hr(),
         
         # Display the reflection text
-        P(reflection['text'])
+        P(reflection['text']),
+
+        # Related reflections panel
+        Div(
+            Hr(),
+            H3("Related reflections"),
+            Ul(*[
+                Li(A(r['title'], href=f"/reflections/{r['id']}"), Small(f" {r['timestamp'].strftime('%Y-%m-%d')}"))
+                for r in related
+            ]),
+            id="related-reflections"
+        ) if related else ""
     )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fasthtml.common import *
 from datetime import datetime
+from uuid import uuid4
 from starlette.responses import Response
 
 from .layout import PageLayout
@@ -9,6 +10,10 @@ from backend.api import (
     db_get_all_users,
     db_classify_reflection,
     db_create_reflection,
+    db_reserve_idempotency_key,
+    db_release_idempotency_key,
+    request_fingerprint,
+    db_find_duplicate,
     ClassifyReflectionInput,
     CreateReflectionInput
 )
@@ -41,6 +46,10 @@ async def render_new_reflection_page():
         Textarea(name="text", id="text", placeholder="Write your reflection...", rows="10", cols="50"),
         Br(), Br(),
         
+        # A fresh token per render: submitting the same form twice
+        # (double click, back + resubmit) creates only one reflection
+        Hidden(name="idempotency_key", value=uuid4().hex),
+
         Button("Submit Reflection", type="submit"),
         
         # Standard form submission
@@ -54,31 +63,51 @@ async def render_new_reflection_page():
         initial_form
     )
 
-async def handle_create_reflection(user_id: str, title: str, text: str):
+async def handle_create_reflection(user_id: str, title: str, text: str, idempotency_key: str | None = None):
     """
     Process:
+    0. Reserve the form token; if this form was already submitted, return
+       the original result (waiting for it if it is still being processed).
     1. Classifies the reflection to get a list of topics.
     2. Creates ONE reflection, linking it to ALL topics.
     """
     
-    # --- Step 1: Call Classifier ---
-    classify_input = ClassifyReflectionInput(
-        title=title,
-        text=text,
-        timestamp=datetime.now()
-    )
-    # Call the DB function directly
-    classified_output = await db_classify_reflection(classify_input)
-    topic_list = classified_output.topics # e.g., ["learning", "python"]
+    # --- Step 0: Repeat submission? Skip classification and insert ---
+    # The form fields are the request: the topics are not known yet
+    request_hash = request_fingerprint(int(user_id), title, text)
+    if idempotency_key:
+        existing = await db_reserve_idempotency_key(int(user_id), idempotency_key, request_hash)
+        if existing:
+            return existing
 
-    # --- Step 2: Call Create Reflection ONCE ---
-    reflection_input = CreateReflectionInput(
-        title=title,
-        text=text,
-        timestamp=datetime.now(),
-        topics=topic_list,  # <-- Pass the full list
-        user_id=int(user_id) # Cast user_id to int
-    )
-        
-    # Call the create function one time
-    await db_create_reflection(reflection_input)
\ No newline at end of file
+    try:
+        # --- Step 1: Call Classifier (unless it nearly duplicates a recent reflection) ---
+        duplicate = db_find_duplicate(int(user_id), text)
+        if duplicate:
+            topic_list = duplicate['topics'] # reuse the original's topics, no LLM call
+        else:
+            classify_input = ClassifyReflectionInput(
+                title=title,
+                text=text,
+                timestamp=datetime.now()
+            )
+            # Call the DB function directly
+            classified_output = await db_classify_reflection(classify_input)
+            topic_list = classified_output.topics # e.g., ["learning", "python"]
+
+        # --- Step 2: Call Create Reflection ONCE ---
+        reflection_input = CreateReflectionInput(
+            title=title,
+            text=text,
+            timestamp=datetime.now(),
+            topics=topic_list,  # <-- Pass the full list
+            user_id=int(user_id) # Cast user_id to int
+        )
+
+        # Call the create function one time
+        return await db_create_reflection(reflection_input, idempotency_key, request_hash)
+    except BaseException:
+        # Let the form be submitted again
+        if idempotency_key:
+            db_release_idempotency_key(int(user_id), idempotency_key)
+        raise
@@ -3,7 +3,8 @@ from datetime import datetime
 from .layout import PageLayout
 
 # Import backend DB functions
-from backend.api import db_get_all_reflections, db_get_all_users
+from backend.api import db_get_all_reflections, db_get_all_users, use_primary
+from backend.cache import fragments_cache
 
 async def render_reflections_page(user_id: str | None = None):
     """
@@ -12,7 +13,41 @@ async def render_reflections_page(user_id: str | None = None):
     
     # Get all users for the dropdown
     users = db_get_all_users()
-    
+
+    def load_reflection_list():
+        # Cached entries are read from the primary (see backend/api.py)
+        with use_primary():
+            return to_xml(render_reflection_list(users, user_id))
+
+    # New reflections and newly attached topics are pushed over SSE:
+    # "created" cards are prepended to the list, "updated" cards replace
+    # theirs by id (out of band)
+    events_url = "/reflections/events"
+    if user_id and user_id != "all":
+        events_url += f"?user_id={user_id}"
+
+    return PageLayout(
+        "All Reflections",
+        H1("All Reflections"),
+        render_filter_form(users, user_id),
+        Hr(),
+        Div(
+            Div(sse_swap="updated", hx_swap="none"),
+            # The list is the expensive part; it is cached per filter and
+            # invalidated (in every worker) when reflections or users change
+            NotStr(fragments_cache.get_or_load(
+                ("reflection-list", user_id or "all"),
+                load_reflection_list
+            )),
+            hx_ext="sse",
+            sse_connect=events_url
+        )
+    )
+
+def render_reflection_list(users, user_id: str | None = None):
+    """
+    Renders the reflection cards for the selected user (or everyone).
+    """
     # Get all reflections
     all_reflections = db_get_all_reflections()
     
@@ -31,10 +66,36 @@ async def render_reflections_page(user_id: str | None = None):
     # Create a simple lookup map to show user names
     user_map = {u.id: (u.firstname or u.email) for u in users}
 
-    # --- Page Content ---
-    
-    # The Filter Form (using standard HTML form)
-    filter_form = Form(
+    # The List of Reflections (new cards are swapped in at the top)
+    return Div(
+        *[render_reflection_card(r, user_map) for r in filtered_reflections],
+        id="reflection-list",
+        sse_swap="created",
+        hx_swap="afterbegin"
+    )
+
+def render_reflection_card(r: dict, user_map: dict):
+    """
+    One reflection in the list; the id lets live updates replace it.
+    """
+    timestamp = r['timestamp']
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return A(
+        Div(
+            H3(r['title']),
+            Small(f"By {user_map.get(r['user_id'], 'Unknown')}, {timestamp.strftime('%Y-%m-%d')}"),
+            Ul(*[Li(topic) for topic in r['topics']]),
+        ),
+        href=f"/reflections/{r['id']}", # Link to the detail page
+        id=f"reflection-{r['id']}"
+    )
+
+def render_filter_form(users, user_id: str | None = None):
+    """
+    The Filter Form (using standard HTML form)
+    """
+    return Form(
         Label("Filter by User:"),
         Br(),
         Select(
@@ -53,29 +114,4 @@ async def render_reflections_page(user_id: str | None = None):
         # Standard form submission
         action="/reflections",
         method="get"
-    )
-
-    # The List of Reflections
-    # The List of Reflections
-    reflection_list = Div(
-        *[
-            A(
-                Div(
-                    H3(r['title']),
-                    Small(f"By {user_map.get(r['user_id'], 'Unknown')}, {r['timestamp'].strftime('%Y-%m-%d') if isinstance(r['timestamp'], datetime) else r['timestamp']}"),
-                    Ul(*[Li(topic) for topic in r['topics']]),
-                ),
-                href=f"/reflections/{r['id']}" # Link to the detail page
-            )
-            for r in filtered_reflections
-        ],
-        id="reflection-list"
-    )
-
-    return PageLayout(
-        "All Reflections",
-        H1("All Reflections"),
-        filter_form,
-        Hr(),
-        reflection_list
     )
\ No newline at end of file
@@ -1,12 +1,22 @@
 from fasthtml.common import *
+from contextlib import nullcontext
 from starlette.responses import RedirectResponse
 
 # --- Import from your backend ---
-from backend.api import app as api_app
+from backend.api import (
+    app as api_app,
+    use_primary,
+    READ_PRIMARY_COOKIE,
+    READ_PRIMARY_SECONDS,
+    db_get_all_users,
+    start_worker,
+    stop_worker
+)
+from backend.events import broker
 
 # --- Import your new page components ---
 from .components.layout import PageLayout
-from .components.reflections_list import render_reflections_page
+from .components.reflections_list import render_reflections_page, render_reflection_card
 from .components.reflection_detail import render_reflection_detail_page
 from .components.reflection_form import (
     render_new_reflection_page,
@@ -14,13 +24,25 @@ from .components.reflection_form import (
 )
 
 # Initialize your main FastHTML app
-app = FastHTML()
+# Each worker listens for cache invalidations from the other workers
+app = FastHTML(
+    on_startup=[start_worker],
+    on_shutdown=[stop_worker]
+)
 
 # Mount your FastAPI app at the /api path
 # All routes from backend/api.py will now be served under /api
 app.mount("/api", api_app)
 
 
+def read_consistency(request):
+    """
+    Right after a write (pin cookie present) read from the primary,
+    otherwise reads may go to a replica.
+    """
+    return use_primary() if request.cookies.get(READ_PRIMARY_COOKIE) else nullcontext()
+
+
 # --- Main Page Routes ---
 
 @app.get("/")
@@ -29,12 +51,32 @@ def home():
     return RedirectResponse(url="/reflections", status_code=302)
 
 @app.get("/reflections")
-async def reflections_list_page(user_id: str = None):
+async def reflections_list_page(request, user_id: str = None):
     """
     Tab 2: Show reflections.
     (With user filter dropdown)
     """
-    return await render_reflections_page(user_id)
+    with read_consistency(request):
+        return await render_reflections_page(user_id)
+
+@app.get("/reflections/events")
+async def reflection_events(user_id: str = None):
+    """
+    Live list updates (SSE): rendered cards for created and updated reflections.
+    """
+    uid = int(user_id) if user_id and user_id.isdigit() else None
+
+    async def stream():
+        async for event in broker.stream(uid):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            user_map = {u.id: (u.firstname or u.email) for u in db_get_all_users()}
+            card = render_reflection_card(event["reflection"], user_map)
+            if event["type"] == "updated":
+                card.attrs["hx-swap-oob"] = "true"
+            yield sse_message(card, event=event["type"])
+    return EventStream(stream())
 
 @app.get("/reflections/new")
 async def new_reflection_page():
@@ -44,21 +86,24 @@ async def new_reflection_page():
     return await render_new_reflection_page()
 
 @app.get("/reflections/{reflection_id}")
-async def reflection_detail_page(reflection_id: int):
+async def reflection_detail_page(request, reflection_id: int):
     """
     Show a single reflection when clicked.
     """
-    return await render_reflection_detail_page(reflection_id)
+    with read_consistency(request):
+        return await render_reflection_detail_page(reflection_id)
     
 # --- Form Handling Routes ---
 
 @app.post("/reflections/create")
-async def create_reflection_handler(user_id: str, title: str, text: str):
+async def create_reflection_handler(user_id: str, title: str, text: str, idempotency_key: str = None):
     """
     Handles the ENTIRE creation process:
     1. Classifies reflection
     2. Creates reflection (and any new topics)
-    3. Redirects to the reflection list
+    3. Redirects to the reflection list (read from the primary)
     """
-    await handle_create_reflection(user_id, title, text)
-    return RedirectResponse(url="/reflections", status_code=303)
\ No newline at end of file
+    await handle_create_reflection(user_id, title, text, idempotency_key)
+    response = RedirectResponse(url="/reflections", status_code=303)
+    response.set_cookie(READ_PRIMARY_COOKIE, "1", max_age=READ_PRIMARY_SECONDS, httponly=True)
+    return response
\ No newline at end of file
@@ -4,21 +4,63 @@ Main application entry point.
 This file imports the assembled app from the frontend package
 and runs the server.
 
-To run: python main.py
+To run (development, single process): python main.py
+To run (production, multiple workers): python main.py --production --workers 4
+
+Every option can also be set in .env:
+APP_ENV=production, APP_HOST, APP_PORT, APP_WORKERS, APP_GRACEFUL_TIMEOUT
 """
+import argparse
+import os
 import sys
 import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
 
-# Import the 'app' object defined in front-end/ui.py
+# Import string of the 'app' object defined in frontend/ui.py.
 # This app object already has all UI routes and the API mounted.
-from frontend.ui import app
+APP_IMPORT = "frontend.ui:app"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Reflection App")
+    parser.add_argument("--production", action="store_true",
+                        default=os.getenv("APP_ENV") == "production",
+                        help="serve with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("APP_HOST", "localhost"),
+                        help="bind address (use 0.0.0.0 to listen on all interfaces)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("APP_PORT", "8000")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("APP_WORKERS", str(os.cpu_count() or 1))),
+                        help="worker processes in production mode")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(os.getenv("APP_GRACEFUL_TIMEOUT", "30")),
+                        help="seconds to let in-flight requests finish on shutdown")
+    return parser.parse_args()
 
 # This is now the one and only entry point
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        print("Starting application server on http://localhost:8000")
-        # use uvicorn.run() directly for more control
-        uvicorn.run(app, host="localhost", port=8000)
+        if args.production:
+            print(f"Starting {args.workers} workers on http://{args.host}:{args.port}")
+            # Workers are separate processes, so uvicorn needs the import string.
+            # Caches are kept per worker and invalidated across workers
+            # through backend/cache.py.
+            uvicorn.run(
+                APP_IMPORT,
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                proxy_headers=True,
+                timeout_graceful_shutdown=args.graceful_timeout,
+            )
+        else:
+            print(f"Starting application server on http://{args.host}:{args.port}")
+            # use uvicorn.run() directly for more control
+            from frontend.ui import app
+            uvicorn.run(app, host=args.host, port=args.port,
+                        timeout_graceful_shutdown=args.graceful_timeout)
     except Exception as e:
         print(f"❌ ERROR: Failed to start server: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)